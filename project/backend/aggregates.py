@@ -0,0 +1,235 @@
+import math
+import os
+from collections import Counter
+
+import numpy as np
+
+from batch import ASSESSMENTS
+from lookup import DEFAULT_INDUSTRY_MULTIPLE
+
+# Relative error of the medians; they come from mergeable sketches rather than from every value
+SUMMARY_ACCURACY = float(os.environ.get("DEAL_SUMMARY_ACCURACY", 0.01))
+# Upper bounds of the months-of-cash buckets; the last bucket is open-ended
+RUNWAY_BUCKETS = (3, 6, 12, 18, 24, 36)
+RUNWAY_BUCKET_LABELS = tuple(
+    [f"<{RUNWAY_BUCKETS[0]}"]
+    + [f"{low}-{high}" for low, high in zip(RUNWAY_BUCKETS, RUNWAY_BUCKETS[1:])]
+    + [f"{RUNWAY_BUCKETS[-1]}+"]
+)
+
+# Where each assessment's counts start in a flat row of counts, in ASSESSMENTS order
+_OFFSETS = np.cumsum([0] + [len(labels) for _, _, labels in ASSESSMENTS]).tolist()
+
+
+class QuantileSketch:
+    # Log-bucketed counts in the style of DDSketch: any quantile is within SUMMARY_ACCURACY of a true value and
+    # two sketches merge by adding their counts, so chunks can be summarized anywhere and combined in any order
+
+    def __init__(self, accuracy=SUMMARY_ACCURACY):
+        self.accuracy = accuracy
+        self.gamma = (1 + accuracy) / (1 - accuracy)
+        self.positive = Counter()
+        self.negative = Counter()
+        self.zeros = 0
+        self.count = 0
+
+    def _keys(self, magnitudes):
+        return np.ceil(np.log(magnitudes) / math.log(self.gamma)).astype(np.int64)
+
+    def add(self, values):
+        values = values[np.isfinite(values)]
+        self.count += len(values)
+        self.zeros += int(np.count_nonzero(values == 0))
+        for buckets, selected in ((self.positive, values[values > 0]), (self.negative, -values[values < 0])):
+            if len(selected):
+                keys, counts = np.unique(self._keys(selected), return_counts=True)
+                buckets.update(dict(zip(keys.tolist(), counts.tolist())))
+
+    def merge(self, other):
+        self.positive.update(other.positive)
+        self.negative.update(other.negative)
+        self.zeros += other.zeros
+        self.count += other.count
+        return self
+
+    def _value(self, key):
+        return 2 * self.gamma ** key / (self.gamma + 1)
+
+    def quantile(self, q):
+        if not self.count:
+            return None
+        rank = q * (self.count - 1)
+        seen = 0
+        for key in sorted(self.negative, reverse=True):
+            seen += self.negative[key]
+            if seen > rank:
+                return -self._value(key)
+        seen += self.zeros
+        if seen > rank:
+            return 0.0
+        for key in sorted(self.positive):
+            seen += self.positive[key]
+            if seen > rank:
+                return self._value(key)
+        return self._value(max(self.positive))
+
+
+def _groups(keys):
+    # Distinct keys and, for each, the positions holding it
+    names, inverse = np.unique(keys, return_inverse=True)
+    order = np.argsort(inverse, kind="stable")
+    bounds = np.cumsum(np.bincount(inverse, minlength=len(names)))
+    return names.tolist(), inverse, np.split(order, bounds[:-1])
+
+
+def _counts(counts):
+    return {
+        name: dict(zip(labels, counts[start:stop].tolist()))
+        for (name, _, labels), start, stop in zip(ASSESSMENTS, _OFFSETS, _OFFSETS[1:])
+    }
+
+
+def _mean(total, count):
+    return total / count if count else None
+
+
+def _ratio(value, benchmark):
+    return None if value is None or not benchmark else value / benchmark
+
+
+class PortfolioAggregate:
+    # Portfolio rollups built one evaluated chunk at a time. Every field is a count, a sum or a sketch, so
+    # aggregates of separate chunks, from any worker, merge into exactly what one pass over all rows gives.
+    # Only rows that evaluated are rolled up; rows that failed to parse or evaluate are counted as errors.
+
+    def __init__(self, accuracy=SUMMARY_ACCURACY):
+        self.accuracy = accuracy
+        self.rows = 0
+        self.errors = 0
+        self.industries = {}  # industry -> [assessment counts, implied count, implied sum, QuantileSketch]
+        self.security_types = {}  # security type -> [deals, total ask]
+        self.runway_buckets = np.zeros(len(RUNWAY_BUCKET_LABELS), dtype=np.int64)
+        self.months_of_cash = QuantileSketch(accuracy)
+
+    def add_errors(self, count):
+        # Rows rejected before evaluation, such as CSV lines that did not parse
+        self.rows += count
+        self.errors += count
+
+    def add(self, columns, batch):
+        self.rows += len(columns)
+        self.errors += len(batch.errors)
+        valid = np.ones(len(columns), dtype=bool)
+        valid[list(batch.errors)] = False
+        if not valid.any():
+            return
+
+        names, inverse, positions = _groups(columns.industry[valid])
+        width = _OFFSETS[-1]
+        counts = np.zeros((len(names), width), dtype=np.int64)
+        for (_, codes, labels), start in zip(ASSESSMENTS, _OFFSETS):
+            flat = np.bincount(inverse * len(labels) + getattr(batch, codes)[valid], minlength=len(names) * len(labels))
+            counts[:, start:start + len(labels)] = flat.reshape(len(names), len(labels))
+        implied = batch.implied_multiple[valid]
+        for name, row, selected in zip(names, counts, positions):
+            values = implied[selected]
+            values = values[np.isfinite(values)]
+            entry = self.industries.get(name)
+            if entry is None:
+                entry = self.industries[name] = [np.zeros(width, dtype=np.int64), 0, 0.0, QuantileSketch(self.accuracy)]
+            entry[0] += row
+            entry[1] += len(values)
+            entry[2] += float(values.sum())
+            entry[3].add(values)
+
+        names, inverse, _ = _groups(columns.security_type[valid])
+        deals = np.bincount(inverse, minlength=len(names)).tolist()
+        asks = np.bincount(inverse, weights=columns.ask[valid], minlength=len(names)).tolist()
+        for name, count, ask in zip(names, deals, asks):
+            entry = self.security_types.setdefault(name, [0, 0.0])
+            entry[0] += count
+            entry[1] += ask
+
+        months = batch.months_of_cash[valid]
+        months = months[np.isfinite(months)]
+        self.runway_buckets += np.bincount(
+            np.searchsorted(RUNWAY_BUCKETS, months, side="right"), minlength=len(RUNWAY_BUCKET_LABELS)
+        )
+        self.months_of_cash.add(months)
+
+    def merge(self, other):
+        self.rows += other.rows
+        self.errors += other.errors
+        for name, (counts, implied_count, implied_sum, sketch) in other.industries.items():
+            entry = self.industries.get(name)
+            if entry is None:
+                entry = self.industries[name] = [np.zeros_like(counts), 0, 0.0, QuantileSketch(self.accuracy)]
+            entry[0] += counts
+            entry[1] += implied_count
+            entry[2] += implied_sum
+            entry[3].merge(sketch)
+        for name, (count, ask) in other.security_types.items():
+            entry = self.security_types.setdefault(name, [0, 0.0])
+            entry[0] += count
+            entry[1] += ask
+        self.runway_buckets += other.runway_buckets
+        self.months_of_cash.merge(other.months_of_cash)
+        return self
+
+    def summary(self, snapshot):
+        # Benchmarks are the snapshot's industry multiples: unlisted industries use the default multiple and
+        # industries without a multiple ("Other") have no benchmark
+        multiples = snapshot.industry_multiples
+        totals = np.zeros(_OFFSETS[-1], dtype=np.int64)
+        portfolio_sketch = QuantileSketch(self.accuracy)
+        portfolio_count = 0
+        portfolio_sum = 0.0
+        industries = {}
+        for name in sorted(self.industries):
+            counts, implied_count, implied_sum, sketch = self.industries[name]
+            totals += counts
+            portfolio_sketch.merge(sketch)
+            portfolio_count += implied_count
+            portfolio_sum += implied_sum
+            benchmark = multiples.get(name, DEFAULT_INDUSTRY_MULTIPLE)
+            mean = _mean(implied_sum, implied_count)
+            median = sketch.quantile(0.5)
+            industries[name] = {
+                "deals": int(counts[:_OFFSETS[1]].sum()),
+                "assessments": _counts(counts),
+                "implied_multiple": {
+                    "count": implied_count,
+                    "mean": mean,
+                    "median": median,
+                    "benchmark": benchmark,
+                    "mean_to_benchmark": _ratio(mean, benchmark),
+                    "median_to_benchmark": _ratio(median, benchmark),
+                },
+            }
+        evaluated = self.rows - self.errors
+        return {
+            "rows": self.rows,
+            "evaluated": evaluated,
+            "errors": self.errors,
+            "config_version": snapshot.version,
+            "median_relative_error": self.accuracy,
+            "assessments": _counts(totals),
+            "implied_multiple": {
+                "count": portfolio_count,
+                "mean": _mean(portfolio_sum, portfolio_count),
+                "median": portfolio_sketch.quantile(0.5),
+            },
+            "industries": industries,
+            "security_types": {
+                name: {"deals": count, "total_ask": ask, "mean_ask": _mean(ask, count)}
+                for name, (count, ask) in sorted(self.security_types.items())
+            },
+            "runway": {
+                "assessments": _counts(totals)["runway_assessment"],
+                "months_of_cash": {
+                    "count": self.months_of_cash.count,
+                    "median": self.months_of_cash.quantile(0.5),
+                    "buckets": dict(zip(RUNWAY_BUCKET_LABELS, self.runway_buckets.tolist())),
+                },
+            },
+        }
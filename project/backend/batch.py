@@ -0,0 +1,418 @@
+import math
+from dataclasses import dataclass
+from itertools import chain
+from typing import Dict, NamedTuple, Tuple
+
+import numpy as np
+
+from config_store import current_snapshot
+from lookup import DISCOUNT_APPLIES, INTEREST_APPLIES, build_tables, encode_securities
+
+# Assessment labels, indexed by the codes produced by evaluate_batch
+GROWTH_LABELS = ("Aggressive", "Standard", "Low")
+DISCOUNT_LABELS = ("Does not apply", "Zero Discount", "Lower Discount", "Standard Discount", "Higher Discount")
+INTEREST_LABELS = ("Does not apply", "Zero Interest", "Lower Interest", "Standard Interest", "Higher Interest")
+VALUATION_LABELS = ("Incomplete", "High Valuation", "Fair Valuation", "Favorable Valuation")
+RUNWAY_LABELS = ("Unknown", "Adequate", "Inadequate")
+
+GROWTH_CODES = {label: code for code, label in enumerate(GROWTH_LABELS)}
+DISCOUNT_CODES = {label: code for code, label in enumerate(DISCOUNT_LABELS)}
+INTEREST_CODES = {label: code for code, label in enumerate(INTEREST_LABELS)}
+VALUATION_CODES = {label: code for code, label in enumerate(VALUATION_LABELS)}
+RUNWAY_CODES = {label: code for code, label in enumerate(RUNWAY_LABELS)}
+
+# Every assessment with the name it is reported and stored under, its BatchResult codes and their labels
+ASSESSMENTS = (
+    ("discount_rate_assessment", "discount_codes", DISCOUNT_LABELS),
+    ("interest_rate_assessment", "interest_codes", INTEREST_LABELS),
+    ("valuation_assessment", "valuation_codes", VALUATION_LABELS),
+    ("runway_assessment", "runway_codes", RUNWAY_LABELS),
+)
+ASSESSMENT_LABELS = {name: labels for name, _, labels in ASSESSMENTS}
+
+# Config keys each assessment depends on; the industry multiples feed the valuation only
+DEPENDENCIES = {
+    "discount_rate_assessment": ("modeled_discount_rate",),
+    "interest_rate_assessment": ("modeled_interest_rate",),
+    "valuation_assessment": ("modeled_valuation_threshold",),
+    "runway_assessment": ("modeled_cash_months",),
+}
+
+NUMERIC_COLUMNS = ("ask", "valuation_cap", "discount_rate", "interest", "monthly_burn", "current_cash")
+
+
+# Compact result for one deal; assessments are codes and a missing implied multiple is NaN
+class MetricsRow(NamedTuple):
+    growth_rates: Tuple[float, ...]
+    growth_codes: bytes
+    implied_multiple: float
+    discount: int
+    interest: int
+    valuation: int
+    runway: int
+    months_of_cash: float
+
+
+# Placeholder for rows that could not be evaluated
+ERROR_ROW = MetricsRow((), b"", math.nan, 0, 0, 0, 0, math.nan)
+
+
+def pack_deal(deal):
+    return MetricsRow(
+        growth_rates=tuple(deal.growth_rates),
+        growth_codes=bytes(GROWTH_CODES[label] for label in deal.growth_rate_assessment),
+        implied_multiple=math.nan if deal.implied_multiple is None else deal.implied_multiple,
+        discount=DISCOUNT_CODES[deal.assessment_discount_rate],
+        interest=INTEREST_CODES[deal.assessment_deal_interest],
+        valuation=VALUATION_CODES[deal.valuation_assessment],
+        runway=RUNWAY_CODES[deal.runway_assessment],
+        months_of_cash=deal.months_of_cash if deal.monthly_burn else math.nan,
+    )
+
+
+def unpack_row(row):
+    # Expands a MetricsRow into the dict returned by Deal.calculate_metrics
+    return {
+        "growth_rates": list(row.growth_rates),
+        "implied_multiples": None if math.isnan(row.implied_multiple) else row.implied_multiple,
+        "discount_rate_assessment": DISCOUNT_LABELS[row.discount],
+        "interest_rate_assessment": INTEREST_LABELS[row.interest],
+        "valuation_assessment": VALUATION_LABELS[row.valuation],
+        "runway_assessment": RUNWAY_LABELS[row.runway],
+    }
+
+
+def to_float(value):
+    # Blank CSV cells and missing optional fields fall back to the DealData default
+    if value is None or value == "":
+        return 0.0
+    return float(value)
+
+
+def _offsets(lengths):
+    offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    return offsets
+
+
+# Column-oriented deal inputs; yearly revenue is stored as one flat array plus row offsets
+@dataclass
+class DealColumns:
+    company_name: np.ndarray
+    industry: np.ndarray
+    security_type: np.ndarray
+    ask: np.ndarray
+    valuation_cap: np.ndarray
+    discount_rate: np.ndarray
+    interest: np.ndarray
+    monthly_burn: np.ndarray
+    current_cash: np.ndarray
+    revenue: np.ndarray
+    revenue_offsets: np.ndarray
+
+    def __len__(self):
+        return len(self.revenue_offsets) - 1
+
+    def revenue_of(self, i):
+        return self.revenue[self.revenue_offsets[i]:self.revenue_offsets[i + 1]]
+
+    def slice(self, start, stop):
+        offsets = self.revenue_offsets[start:stop + 1]
+        return DealColumns(
+            company_name=self.company_name[start:stop],
+            industry=self.industry[start:stop],
+            security_type=self.security_type[start:stop],
+            revenue=self.revenue[offsets[0]:offsets[-1]],
+            revenue_offsets=offsets - offsets[0],
+            **{name: getattr(self, name)[start:stop] for name in NUMERIC_COLUMNS},
+        )
+
+    def take(self, indices):
+        indices = np.asarray(indices, dtype=np.int64)
+        starts = self.revenue_offsets[indices]
+        lengths = self.revenue_offsets[indices + 1] - starts
+        offsets = _offsets(lengths)
+        positions = np.repeat(starts - offsets[:-1], lengths) + np.arange(offsets[-1])
+        return DealColumns(
+            company_name=self.company_name[indices],
+            industry=self.industry[indices],
+            security_type=self.security_type[indices],
+            revenue=self.revenue[positions],
+            revenue_offsets=offsets,
+            **{name: getattr(self, name)[indices] for name in NUMERIC_COLUMNS},
+        )
+
+    @classmethod
+    def from_records(cls, records):
+        records = list(records)
+        revenues = [[to_float(value) for value in record["yearly_revenue"]] for record in records]
+        offsets = _offsets([len(revenue) for revenue in revenues])
+        numeric = {
+            name: np.fromiter((to_float(record.get(name)) for record in records), dtype=np.float64, count=len(records))
+            for name in NUMERIC_COLUMNS
+        }
+        return cls(
+            company_name=np.array([record.get("company_name", "") for record in records], dtype=object),
+            industry=np.array([record.get("industry", "") for record in records], dtype=object),
+            security_type=np.array([record.get("security_type", "") for record in records], dtype=object),
+            revenue=np.fromiter(chain.from_iterable(revenues), dtype=np.float64, count=int(offsets[-1])),
+            revenue_offsets=offsets,
+            **numeric,
+        )
+
+    @classmethod
+    def from_columns(cls, company_name, industry, security_type, yearly_revenue, **numeric):
+        # Builds the batch straight from parallel lists; numeric columns that are left out default to zero
+        offsets = _offsets([len(revenue) for revenue in yearly_revenue])
+        return cls(
+            company_name=np.array(company_name, dtype=object),
+            industry=np.array(industry, dtype=object),
+            security_type=np.array(security_type, dtype=object),
+            revenue=np.fromiter(chain.from_iterable(yearly_revenue), dtype=np.float64, count=int(offsets[-1])),
+            revenue_offsets=offsets,
+            **{
+                name: np.zeros(len(company_name), dtype=np.float64) if numeric.get(name) is None
+                else np.asarray(numeric[name], dtype=np.float64)
+                for name in NUMERIC_COLUMNS
+            },
+        )
+
+
+# Column-oriented evaluation results; assessments are stored as codes into the *_LABELS tables
+@dataclass
+class BatchResult:
+    growth_rates: np.ndarray
+    growth_offsets: np.ndarray
+    growth_codes: np.ndarray
+    implied_multiple: np.ndarray
+    discount_codes: np.ndarray
+    interest_codes: np.ndarray
+    valuation_codes: np.ndarray
+    runway_codes: np.ndarray
+    months_of_cash: np.ndarray
+    errors: Dict[int, str]
+
+    def __len__(self):
+        return len(self.growth_offsets) - 1
+
+    def metrics(self, i):
+        if i in self.errors:
+            raise ValueError(self.errors[i])
+        valuation = int(self.valuation_codes[i])
+        implied = float(self.implied_multiple[i])
+        return {
+            "growth_rates": self.growth_rates[self.growth_offsets[i]:self.growth_offsets[i + 1]].tolist(),
+            "implied_multiples": None if math.isnan(implied) else implied,
+            "discount_rate_assessment": DISCOUNT_LABELS[self.discount_codes[i]],
+            "interest_rate_assessment": INTEREST_LABELS[self.interest_codes[i]],
+            "valuation_assessment": VALUATION_LABELS[valuation],
+            "runway_assessment": RUNWAY_LABELS[self.runway_codes[i]],
+        }
+
+    def iter_metrics(self):
+        # Yields the same dict as Deal.calculate_metrics, or None for rows listed in errors
+        growth_rates = self.growth_rates.tolist()
+        growth_offsets = self.growth_offsets.tolist()
+        implied = self.implied_multiple.tolist()
+        columns = zip(
+            self.discount_codes.tolist(),
+            self.interest_codes.tolist(),
+            self.valuation_codes.tolist(),
+            self.runway_codes.tolist(),
+        )
+        for i, (discount, interest, valuation, runway) in enumerate(columns):
+            if i in self.errors:
+                yield None
+                continue
+            yield {
+                "growth_rates": growth_rates[growth_offsets[i]:growth_offsets[i + 1]],
+                # NaN marks a deal without first-year revenue
+                "implied_multiples": None if implied[i] != implied[i] else implied[i],
+                "discount_rate_assessment": DISCOUNT_LABELS[discount],
+                "interest_rate_assessment": INTEREST_LABELS[interest],
+                "valuation_assessment": VALUATION_LABELS[valuation],
+                "runway_assessment": RUNWAY_LABELS[runway],
+            }
+
+    def rows(self):
+        growth_rates = self.growth_rates.tolist()
+        growth_codes = self.growth_codes.tobytes()
+        offsets = self.growth_offsets.tolist()
+        columns = zip(
+            self.implied_multiple.tolist(),
+            self.discount_codes.tolist(),
+            self.interest_codes.tolist(),
+            self.valuation_codes.tolist(),
+            self.runway_codes.tolist(),
+            self.months_of_cash.tolist(),
+        )
+        for i, (implied, discount, interest, valuation, runway, months) in enumerate(columns):
+            start, stop = offsets[i], offsets[i + 1]
+            yield MetricsRow(
+                tuple(growth_rates[start:stop]), growth_codes[start:stop], implied, discount, interest, valuation, runway, months
+            )
+
+    @classmethod
+    def from_rows(cls, rows, errors=None):
+        offsets = _offsets([len(row.growth_rates) for row in rows])
+        return cls(
+            growth_rates=np.fromiter(
+                chain.from_iterable(row.growth_rates for row in rows), dtype=np.float64, count=int(offsets[-1])
+            ),
+            growth_offsets=offsets,
+            growth_codes=np.frombuffer(b"".join(row.growth_codes for row in rows), dtype=np.int8).copy(),
+            implied_multiple=np.array([row.implied_multiple for row in rows], dtype=np.float64),
+            discount_codes=np.array([row.discount for row in rows], dtype=np.int8),
+            interest_codes=np.array([row.interest for row in rows], dtype=np.int8),
+            valuation_codes=np.array([row.valuation for row in rows], dtype=np.int8),
+            runway_codes=np.array([row.runway for row in rows], dtype=np.int8),
+            months_of_cash=np.array([row.months_of_cash for row in rows], dtype=np.float64),
+            errors=dict(errors or {}),
+        )
+
+    @classmethod
+    def concat(cls, results):
+        results = list(results)
+        errors = {}
+        start = 0
+        growth_offsets = [np.zeros(1, dtype=np.int64)]
+        growth_start = 0
+        for result in results:
+            errors.update((start + i, error) for i, error in result.errors.items())
+            growth_offsets.append(result.growth_offsets[1:] + growth_start)
+            start += len(result)
+            growth_start += int(result.growth_offsets[-1])
+
+        def join(name, dtype):
+            return np.concatenate([getattr(result, name) for result in results] or [np.zeros(0, dtype=dtype)])
+
+        return cls(
+            growth_rates=join("growth_rates", np.float64),
+            growth_offsets=np.concatenate(growth_offsets),
+            growth_codes=join("growth_codes", np.int8),
+            implied_multiple=join("implied_multiple", np.float64),
+            discount_codes=join("discount_codes", np.int8),
+            interest_codes=join("interest_codes", np.int8),
+            valuation_codes=join("valuation_codes", np.int8),
+            runway_codes=join("runway_codes", np.int8),
+            months_of_cash=join("months_of_cash", np.float64),
+            errors=errors,
+        )
+
+
+# Each assessment depends only on its own inputs and config values, so it can be recomputed on its own
+def assess_discount(securities, discount_rate, config):
+    # securities are codes from lookup.encode_securities
+    modeled_discount = config["modeled_discount_rate"]
+    return np.select(
+        [
+            ~DISCOUNT_APPLIES[securities],
+            discount_rate == 0,
+            discount_rate < modeled_discount,
+            discount_rate == modeled_discount,
+        ],
+        [0, 1, 2, 3],
+        default=4,
+    ).astype(np.int8)
+
+
+def assess_interest(securities, interest, config):
+    modeled_interest = config["modeled_interest_rate"]
+    return np.select(
+        [
+            ~INTEREST_APPLIES[securities],
+            interest == 0,
+            interest < modeled_interest,
+            interest == modeled_interest,
+        ],
+        [0, 1, 2, 3],
+        default=4,
+    ).astype(np.int8)
+
+
+def assess_valuation(implied_multiple, industries, tables):
+    # industries are codes from tables.encode_industries; a NaN implied multiple is Incomplete
+    return np.select(
+        [
+            np.isnan(implied_multiple) | tables.no_benchmark[industries],
+            implied_multiple > tables.high_cutoffs[industries],
+            implied_multiple >= tables.fair_cutoffs[industries],
+        ],
+        [0, 1, 2],
+        default=3,
+    ).astype(np.int8)
+
+
+def assess_runway(months_of_cash, config):
+    # NaN months of cash means there is no burn to measure against
+    return np.select(
+        [np.isnan(months_of_cash), months_of_cash > config["modeled_cash_months"]],
+        [0, 1],
+        default=2,
+    ).astype(np.int8)
+
+
+def evaluate_batch(columns, config=None, multiples=None, tables=None):
+    # Lookup tables are rebuilt only when the caller passes its own config or multiples
+    snapshot = current_snapshot()
+    if config is None and multiples is None and tables is None:
+        tables = snapshot.tables
+    config = snapshot.config if config is None else config
+    multiples = snapshot.industry_multiples if multiples is None else multiples
+    if tables is None:
+        tables = build_tables(config, multiples)
+
+    n = len(columns)
+    rows = np.arange(n)
+    revenue = columns.revenue
+    lengths = np.diff(columns.revenue_offsets)
+    errors = {}
+
+    # Growth rates between consecutive years of the same deal
+    row_of = np.repeat(rows, lengths)
+    same_row = row_of[:-1] == row_of[1:]
+    previous = revenue[:-1][same_row]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        growth_rates = (revenue[1:][same_row] - previous) / previous * 100
+    for i in np.unique(row_of[:-1][same_row][previous == 0]).tolist():
+        errors[i] = "float division by zero"
+    growth_offsets = _offsets(np.maximum(lengths - 1, 0))
+    growth_codes = np.select(
+        [
+            growth_rates >= config["modeled_revenue_growth_aggressive"] * 100,
+            growth_rates >= config["modeled_revenue_growth_standard"] * 100,
+        ],
+        [0, 1],
+        default=2,
+    ).astype(np.int8)
+
+    # Implied Multiple
+    empty = lengths == 0
+    for i in rows[empty].tolist():
+        errors.setdefault(i, "list index out of range")
+    first_revenue = np.zeros(n, dtype=np.float64)
+    first_revenue[~empty] = revenue[columns.revenue_offsets[:-1][~empty]]
+    incomplete = first_revenue == 0
+    with np.errstate(divide="ignore", invalid="ignore"):
+        implied_multiple = np.where(incomplete, np.nan, columns.valuation_cap / first_revenue)
+
+    securities = encode_securities(columns.security_type)
+    discount_codes = assess_discount(securities, columns.discount_rate, config)
+    interest_codes = assess_interest(securities, columns.interest, config)
+    valuation_codes = assess_valuation(implied_multiple, tables.encode_industries(columns.industry), tables)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        months_of_cash = np.where(columns.monthly_burn == 0, np.nan, columns.current_cash / columns.monthly_burn)
+    runway_codes = assess_runway(months_of_cash, config)
+
+    return BatchResult(
+        growth_rates=growth_rates,
+        growth_offsets=growth_offsets,
+        growth_codes=growth_codes,
+        implied_multiple=implied_multiple,
+        discount_codes=discount_codes,
+        interest_codes=interest_codes,
+        valuation_codes=valuation_codes,
+        runway_codes=runway_codes,
+        months_of_cash=months_of_cash,
+        errors=errors,
+    )
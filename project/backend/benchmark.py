@@ -0,0 +1,193 @@
+import argparse
+import json
+import os
+import platform
+import resource
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+from synthetic import generate_csv, generate_deals
+
+
+def isolate_state(state_dir):
+    # The runs publish config versions and write through the app, so the deal store, jobs and uploads go to
+    # state_dir, as in loadtest.start_server, and the config stays in this process. The backend reads these
+    # settings when it is imported, so this runs first.
+    os.environ.update(
+        DEAL_STORE_DB=os.path.join(state_dir, "deals.sqlite3"),
+        DEAL_JOBS_DB=os.path.join(state_dir, "jobs.sqlite3"),
+        DEAL_JOBS_DIR=os.path.join(state_dir, "job_uploads"),
+    )
+    os.environ.pop("DEAL_CONFIG_DB", None)
+
+
+def peak_rss_mb():
+    # ru_maxrss is reported in kilobytes on Linux and in bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def summarize(name, latencies, items, elapsed, **extra):
+    latencies = np.asarray(latencies, dtype=np.float64) * 1000
+    return {
+        "name": name,
+        "operations": len(latencies),
+        "items": items,
+        "seconds": round(elapsed, 6),
+        "items_per_second": round(items / elapsed, 2) if elapsed else None,
+        "p50_ms": round(float(np.percentile(latencies, 50)), 6),
+        "p99_ms": round(float(np.percentile(latencies, 99)), 6),
+        "peak_rss_mb": round(peak_rss_mb(), 2),
+        **extra,
+    }
+
+
+def timed(operation, repeat):
+    latencies = []
+    started = time.perf_counter()
+    for _ in range(repeat):
+        start = time.perf_counter()
+        operation()
+        latencies.append(time.perf_counter() - start)
+    return latencies, time.perf_counter() - started
+
+
+def bench_scalar(deals):
+    from engine import Deal
+
+    latencies = []
+    started = time.perf_counter()
+    for record in deals:
+        start = time.perf_counter()
+        Deal(**record).calculate_metrics()
+        latencies.append(time.perf_counter() - start)
+    return summarize("scalar_calculate_metrics", latencies, len(deals), time.perf_counter() - started)
+
+
+def bench_evaluate_deal(client, deals):
+    latencies = []
+    started = time.perf_counter()
+    for record in deals:
+        start = time.perf_counter()
+        response = client.post("/evaluate-deal", json=record)
+        latencies.append(time.perf_counter() - start)
+        response.raise_for_status()
+    return summarize("evaluate_deal_endpoint", latencies, len(deals), time.perf_counter() - started)
+
+
+def bench_upload_csv(client, rows, repeat, seed):
+    from cache import evaluation_cache
+
+    payload = generate_csv(rows, seed)
+
+    def upload():
+        # Measure cold evaluation rather than repeated cache hits
+        evaluation_cache.clear()
+        client.post("/upload-csv", files={"file": ("deals.csv", payload, "text/csv")}).raise_for_status()
+
+    latencies, elapsed = timed(upload, repeat)
+    return summarize(f"upload_csv_{rows}", latencies, rows * repeat, elapsed, payload_bytes=len(payload))
+
+
+def bench_config_under_load(client_factory, deals, readers, updates):
+    # Readers hammer /evaluate-deal while a writer keeps publishing new config versions
+    from config_store import current_snapshot
+
+    original = dict(current_snapshot().config)
+    stop = threading.Event()
+    latencies = []
+    failures = []
+    lock = threading.Lock()
+
+    def reader(offset):
+        client = client_factory()
+        local = []
+        index = offset
+        while not stop.is_set():
+            start = time.perf_counter()
+            response = client.post("/evaluate-deal", json=deals[index % len(deals)])
+            local.append(time.perf_counter() - start)
+            if response.status_code != 200:
+                failures.append(response.status_code)
+            index += readers
+        with lock:
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=reader, args=(offset,)) for offset in range(readers)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    writer = client_factory()
+    update_latencies = []
+    for update in range(updates):
+        config = dict(original, modeled_cash_months=original["modeled_cash_months"] + update % 6)
+        start = time.perf_counter()
+        writer.put("/update-config", json=config).raise_for_status()
+        update_latencies.append(time.perf_counter() - start)
+        time.sleep(0.01)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    # Restored like any other update, so deals stored along the way are brought forward too
+    writer.put("/update-config", json=original).raise_for_status()
+
+    update_summary = summarize("config_updates", update_latencies, updates, elapsed)
+    return summarize(
+        "evaluate_deal_under_config_updates",
+        latencies,
+        len(latencies),
+        elapsed,
+        readers=readers,
+        failures=len(failures),
+        update_p50_ms=update_summary["p50_ms"],
+        update_p99_ms=update_summary["p99_ms"],
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline benchmarks for the deal evaluation hot paths")
+    parser.add_argument("--deals", type=int, default=10_000, help="deals for the scalar and /evaluate-deal runs")
+    parser.add_argument("--csv-rows", type=int, nargs="+", default=[1_000, 100_000, 1_000_000])
+    parser.add_argument("--csv-repeat", type=int, default=3, help="uploads per CSV size")
+    parser.add_argument("--readers", type=int, default=4, help="reader threads for the config-update run")
+    parser.add_argument("--updates", type=int, default=50, help="config updates for the config-update run")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory(prefix="deal-bench-") as state_dir:
+        isolate_state(state_dir)
+        from fastapi.testclient import TestClient
+        from main import app
+
+        deals = generate_deals(args.deals, args.seed)
+        client = TestClient(app)
+        results = [bench_scalar(deals), bench_evaluate_deal(client, deals)]
+        for rows in args.csv_rows:
+            results.append(bench_upload_csv(client, rows, 1 if rows >= 1_000_000 else args.csv_repeat, args.seed))
+        results.append(bench_config_under_load(lambda: TestClient(app), deals, args.readers, args.updates))
+
+    report = {
+        "created": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "seed": args.seed,
+        "results": results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as output:
+            output.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
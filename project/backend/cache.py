@@ -0,0 +1,150 @@
+import asyncio
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from batch import ERROR_ROW, NUMERIC_COLUMNS, BatchResult
+from config_store import current_snapshot
+
+# Bound on cached results and how long each one stays valid; override through the environment
+CACHE_SIZE = int(os.environ.get("DEAL_CACHE_SIZE", 100_000))
+CACHE_TTL = float(os.environ.get("DEAL_CACHE_TTL", 3600))
+# Largest batch served from the cache. Keys are built row by row, which for large batches costs more than the
+# vectorized evaluation it would save, so bigger batches are evaluated outright and never cached
+CACHE_MAX_BATCH = int(os.environ.get("DEAL_CACHE_MAX_BATCH", 1_000))
+
+
+def deal_key(industry, security_type, yearly_revenue, numeric, version):
+    # version is the config snapshot version, so results from an older config never match;
+    # company_name does not affect the metrics, so it is left out of the key
+    canonical = repr((version, industry, security_type, tuple(float(value) for value in yearly_revenue), numeric))
+    return hashlib.blake2b(canonical.encode(), digest_size=16).digest()
+
+
+def record_key(record, version):
+    numeric = tuple(float(record.get(name) or 0.0) for name in NUMERIC_COLUMNS)
+    return deal_key(record["industry"], record["security_type"], record["yearly_revenue"], numeric, version)
+
+
+def column_keys(columns, version):
+    revenue = columns.revenue.tolist()
+    offsets = columns.revenue_offsets.tolist()
+    numeric = zip(*(getattr(columns, name).tolist() for name in NUMERIC_COLUMNS))
+    return [
+        deal_key(industry, security_type, revenue[offsets[i]:offsets[i + 1]], values, version)
+        for i, (industry, security_type, values) in enumerate(
+            zip(columns.industry.tolist(), columns.security_type.tolist(), numeric)
+        )
+    ]
+
+
+class EvaluationCache:
+    # LRU cache of MetricsRow tuples with a per-entry time to live
+
+    def __init__(self, max_size=CACHE_SIZE, ttl=CACHE_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        with self._lock:
+            return self._get(key, time.monotonic())
+
+    def get_many(self, keys):
+        now = time.monotonic()
+        with self._lock:
+            return [self._get(key, now) for key in keys]
+
+    def put(self, key, row):
+        with self._lock:
+            self._put(key, row, time.monotonic() + self.ttl)
+
+    def put_many(self, items):
+        expires = time.monotonic() + self.ttl
+        with self._lock:
+            for key, row in items:
+                self._put(key, row, expires)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "config_version": current_snapshot().version,
+        }
+
+    def _get(self, key, now):
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        if entry[0] < now:
+            del self._entries[key]
+            self.evictions += 1
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def _put(self, key, row, expires):
+        self._entries[key] = (expires, row)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+
+evaluation_cache = EvaluationCache()
+
+
+def _lookup(columns, version):
+    keys = column_keys(columns, version)
+    return keys, evaluation_cache.get_many(keys)
+
+
+def _fill(keys, rows, missing, result):
+    # Caches the fresh rows and merges them with the hits into one BatchResult in row order
+    fresh = list(result.rows())
+    evaluation_cache.put_many(
+        (keys[missing[position]], row) for position, row in enumerate(fresh) if position not in result.errors
+    )
+    if len(missing) == len(rows):
+        return result
+
+    for position, (i, row) in enumerate(zip(missing, fresh)):
+        rows[i] = ERROR_ROW if position in result.errors else row
+    return BatchResult.from_rows(rows, {missing[position]: error for position, error in result.errors.items()})
+
+
+async def evaluate_cached(columns, evaluate, snapshot=None):
+    # Serves cached rows and passes only the misses to evaluate(columns, config, multiples) -> BatchResult.
+    # The key building, lookups and fills run on a thread so the event loop stays free.
+    snapshot = snapshot or current_snapshot()
+    if len(columns) > CACHE_MAX_BATCH:
+        return await evaluate(columns, snapshot.config, snapshot.industry_multiples)
+
+    loop = asyncio.get_running_loop()
+    keys, rows = await loop.run_in_executor(None, _lookup, columns, snapshot.version)
+    missing = [i for i, row in enumerate(rows) if row is None]
+    if not missing:
+        return await loop.run_in_executor(None, BatchResult.from_rows, rows)
+
+    subset = columns if len(missing) == len(rows) else columns.take(missing)
+    result = await evaluate(subset, snapshot.config, snapshot.industry_multiples)
+    return await loop.run_in_executor(None, _fill, keys, rows, missing, result)
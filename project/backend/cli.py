@@ -0,0 +1,203 @@
+import argparse
+import json
+import os
+import sys
+import time
+
+from aggregates import PortfolioAggregate
+from config_store import current_snapshot, derive
+from constants import DEFAULT_CONFIG
+from csv_parser import CSVFormatError
+from engine import evaluate_chunks
+from parallel import EVAL_WORKERS
+from serialization import dumps, encode_metrics, encode_named
+from streaming import encode_lines, iter_csv_file, iter_jsonl_file
+
+# Offline evaluator for nightly portfolio runs. It uses the same engine as the web service without importing
+# FastAPI; pyarrow is only imported for the columnar output formats.
+
+# Input bytes per chunk; each chunk is evaluated as one batch
+CLI_CHUNK_BYTES = int(os.environ.get("DEAL_CLI_CHUNK_BYTES", 4 * 1024 * 1024))
+
+INPUT_FORMATS = ("csv", "jsonl")
+OUTPUT_FORMATS = ("jsonl", "json", "csv", "parquet", "arrow")
+JSONL_EXTENSIONS = (".jsonl", ".ndjson")
+# Output format implied by the extension of -o when --format is not given
+OUTPUT_EXTENSIONS = {
+    ".jsonl": "jsonl",
+    ".ndjson": "jsonl",
+    ".json": "json",
+    ".csv": "csv",
+    ".parquet": "parquet",
+    ".arrows": "arrow",
+    ".arrow": "arrow",
+}
+
+
+def load_json(path, name):
+    with open(path) as source:
+        values = json.load(source)
+    if not isinstance(values, dict):
+        raise ValueError(f"{name} file must hold a JSON object")
+    return values
+
+
+def load_config(path):
+    config = load_json(path, "config")
+    unknown = sorted(set(config) - set(DEFAULT_CONFIG))
+    if unknown:
+        raise ValueError(f"Unknown config keys: {', '.join(unknown)}")
+    return {key: float(value) for key, value in config.items()}
+
+
+def load_multiples(path):
+    # Industry names to multiples; null marks an industry without a benchmark, like "Other"
+    multiples = load_json(path, "multiples")
+    return {name: None if value is None else float(value) for name, value in multiples.items()}
+
+
+class JSONLOutput:
+    # Same lines as /upload-csv/stream
+
+    def __init__(self, target):
+        self.target = target
+
+    def write(self, parsed, batch):
+        self.target.write(b"".join(line + b"\n" for _, line in encode_lines(parsed, batch)))
+
+    def close(self):
+        pass
+
+
+class JSONOutput:
+    # Same body as /upload-csv; results are written as they come and the errors at the end
+
+    def __init__(self, target):
+        self.target = target
+        self.errors = []
+        self.first = True
+        target.write(b'{"results":[')
+
+    def write(self, parsed, batch):
+        company_names = parsed.columns.company_name.tolist()
+        line_numbers = parsed.line_numbers.tolist()
+        results = [result for result in encode_named(company_names, encode_metrics(batch)) if result is not None]
+        if results:
+            self.target.write((b"" if self.first else b",") + b",".join(results))
+            self.first = False
+        self.errors.extend(parsed.errors)
+        self.errors.extend(
+            {"line": line_numbers[i], "company_name": company_names[i], "error": error}
+            for i, error in batch.errors.items()
+        )
+
+    def close(self):
+        self.target.write(b'],"errors":' + dumps(sorted(self.errors, key=lambda error: error["line"])) + b"}")
+
+
+class ColumnarOutput:
+    # Parquet, Arrow or flat CSV through export.ExportWriter
+
+    def __init__(self, target, output_format):
+        from export import ExportWriter
+
+        self.target = target
+        self.writer = ExportWriter(output_format)
+
+    def write(self, parsed, batch):
+        self.target.write(self.writer.write_parsed(parsed, batch))
+
+    def close(self):
+        self.target.write(self.writer.close())
+
+
+def open_output(target, output_format):
+    if output_format == "jsonl":
+        return JSONLOutput(target)
+    if output_format == "json":
+        return JSONOutput(target)
+    return ColumnarOutput(target, output_format)
+
+
+def evaluate_file(
+    source,
+    target,
+    input_format="csv",
+    output_format="jsonl",
+    workers=1,
+    chunk_size=CLI_CHUNK_BYTES,
+    snapshot=None,
+    aggregate=None,
+):
+    # Returns (rows, errors); rows counts every input row, errors the ones that failed to parse or evaluate.
+    # A PortfolioAggregate passed in is updated with every chunk as it is written.
+    chunks = iter_csv_file(source, chunk_size) if input_format == "csv" else iter_jsonl_file(source, chunk_size)
+    output = open_output(target, output_format)
+    rows = errors = 0
+    for parsed, batch in evaluate_chunks(chunks, snapshot, workers):
+        output.write(parsed, batch)
+        if aggregate is not None:
+            aggregate.add(parsed.columns, batch)
+            aggregate.add_errors(len(parsed.errors))
+        rows += len(parsed.columns) + len(parsed.errors)
+        errors += len(parsed.errors) + len(batch.errors)
+    output.close()
+    return rows, errors
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Evaluate a file of deals without running the web service")
+    parser.add_argument("input", help="deals as CSV (the /upload-csv format) or JSON lines, or - for stdin")
+    parser.add_argument("-o", "--output", default="-", help="file to write, default stdout")
+    parser.add_argument("--input-format", choices=INPUT_FORMATS, help="defaults to jsonl for .jsonl/.ndjson, else csv")
+    parser.add_argument("--format", choices=OUTPUT_FORMATS, help="defaults to the output extension, else jsonl")
+    parser.add_argument("--config", help="JSON file of config values layered over the defaults")
+    parser.add_argument("--multiples", help="JSON file of industry multiples layered over the defaults")
+    parser.add_argument("--workers", type=int, default=EVAL_WORKERS, help="worker processes, 1 to stay in process")
+    parser.add_argument("--chunk-size", type=int, default=CLI_CHUNK_BYTES, help="input bytes evaluated per batch")
+    parser.add_argument("--summary", help="also write the portfolio summary as JSON to this file")
+    args = parser.parse_args(argv)
+
+    input_format = args.input_format
+    if input_format is None:
+        input_format = "jsonl" if os.path.splitext(args.input)[1] in JSONL_EXTENSIONS else "csv"
+    output_format = args.format or OUTPUT_EXTENSIONS.get(os.path.splitext(args.output)[1], "jsonl")
+    if args.workers < 1 or args.chunk_size < 1:
+        parser.error("--workers and --chunk-size must be positive")
+    try:
+        if output_format in ("parquet", "arrow", "csv"):
+            from export import check_format
+
+            check_format(output_format)
+        config = load_config(args.config) if args.config else None
+        multiples = load_multiples(args.multiples) if args.multiples else None
+    except (OSError, ValueError) as exc:
+        parser.error(str(exc))
+    # The overrides apply to this run only; nothing is published, even when the config is shared with a server
+    snapshot = current_snapshot()
+    if config or multiples:
+        snapshot = derive(snapshot, config, multiples)
+
+    aggregate = PortfolioAggregate() if args.summary else None
+    started = time.perf_counter()
+    source = sys.stdin.buffer if args.input == "-" else open(args.input, "rb")
+    target = sys.stdout.buffer if args.output == "-" else open(args.output, "wb")
+    try:
+        with source, target:
+            rows, errors = evaluate_file(
+                source, target, input_format, output_format, args.workers, args.chunk_size, snapshot, aggregate
+            )
+        if aggregate is not None:
+            with open(args.summary, "wb") as summary:
+                summary.write(dumps(aggregate.summary(snapshot)) + b"\n")
+    except CSVFormatError as exc:
+        print(f"error: {exc}", file=sys.stderr)
+        return 1
+    elapsed = time.perf_counter() - started
+    rate = rows / elapsed if elapsed else 0.0
+    print(f"{rows} rows, {errors} errors in {elapsed:.2f}s ({rate:.0f} rows/s)", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
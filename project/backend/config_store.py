@@ -0,0 +1,213 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import ChainMap
+from contextlib import contextmanager
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Mapping
+
+from constants import DEFAULT_CONFIG, INDUSTRY_MULTIPLES
+from lookup import LookupTables, build_tables
+
+# SQLite file shared by every worker process of one deployment; when unset the config lives in this process only
+CONFIG_DB = os.environ.get("DEAL_CONFIG_DB") or None
+# Seconds between checks for versions published by other processes, which bounds how stale a worker can be
+CONFIG_POLL_INTERVAL = float(os.environ.get("DEAL_CONFIG_POLL_INTERVAL", 0.25))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS config_versions (
+    version INTEGER PRIMARY KEY,
+    config TEXT NOT NULL,
+    industry_multiples TEXT NOT NULL,
+    published_at REAL NOT NULL
+);
+"""
+
+
+# Read-only view of the config, industry multiples and their lookup tables at one version
+@dataclass(frozen=True)
+class ConfigSnapshot:
+    version: int
+    config: Mapping[str, float]
+    industry_multiples: Mapping[str, float]
+    tables: LookupTables
+
+    def with_overrides(self, overrides):
+        # Layers per-request values over this snapshot without copying it
+        if not overrides:
+            return self.config
+        return ChainMap(dict(overrides), self.config)
+
+
+def _freeze(version, config, industry_multiples):
+    tables = build_tables(config, industry_multiples)
+    return ConfigSnapshot(version, MappingProxyType(dict(config)), MappingProxyType(dict(industry_multiples)), tables)
+
+
+def derive(base, config=None, industry_multiples=None):
+    # The snapshot publishing these values over base would produce, without publishing it
+    merged_config = {**base.config, **(config or {})}
+    merged_multiples = {**base.industry_multiples, **(industry_multiples or {})}
+    return _freeze(base.version + 1, merged_config, merged_multiples)
+
+
+class SharedConfig:
+    # Every published version is one row and the newest row is live. Publishing takes SQLite's write lock, so
+    # versions are numbered in one order across processes; readers only poll PRAGMA data_version, which changes
+    # when another connection commits and costs no disk read.
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        with self.transaction() as connection:
+            connection.execute(SCHEMA)
+            if connection.execute("SELECT 1 FROM config_versions LIMIT 1").fetchone() is None:
+                self._insert(connection, 0, DEFAULT_CONFIG, INDUSTRY_MULTIPLES)
+
+    def _connect(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            # Autocommit mode, so transaction() decides when the write lock is taken
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            self._local.connection = connection
+            self._local.data_version = None
+        return connection
+
+    @contextmanager
+    def transaction(self):
+        connection = self._connect()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            yield connection
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        connection.execute("COMMIT")
+
+    @staticmethod
+    def _insert(connection, version, config, industry_multiples):
+        connection.execute(
+            "INSERT INTO config_versions (version, config, industry_multiples, published_at) VALUES (?, ?, ?, ?)",
+            (version, json.dumps(dict(config)), json.dumps(dict(industry_multiples)), time.time()),
+        )
+
+    def latest(self, connection=None):
+        connection = connection or self._connect()
+        version, config, industry_multiples = connection.execute(
+            "SELECT version, config, industry_multiples FROM config_versions ORDER BY version DESC LIMIT 1"
+        ).fetchone()
+        return version, json.loads(config), json.loads(industry_multiples)
+
+    def changed(self):
+        # True the first time and whenever another connection has committed since the last call
+        connection = self._connect()
+        data_version = connection.execute("PRAGMA data_version").fetchone()[0]
+        changed = data_version != self._local.data_version
+        self._local.data_version = data_version
+        return changed
+
+    def publish(self, connection, snapshot):
+        self._insert(connection, snapshot.version, snapshot.config, snapshot.industry_multiples)
+
+
+_shared = None
+_write_lock = threading.Lock()
+# constants.py only seeds the first version; it is never mutated
+_current = _freeze(0, DEFAULT_CONFIG, INDUSTRY_MULTIPLES)
+
+
+def attach(path):
+    # Serves the config kept in the shared file at path from now on, starting with its newest version
+    global _shared, _current
+    with _write_lock:
+        _shared = SharedConfig(path)
+        _current = _freeze(*_shared.latest())
+    return _current
+
+
+if CONFIG_DB:
+    attach(CONFIG_DB)
+
+
+def current_snapshot():
+    # Rebinding _current is atomic, so readers never need the lock
+    return _current
+
+
+@contextmanager
+def publishing(config=None, industry_multiples=None):
+    # Yields (previous, snapshot) for the merged values; the new version is installed once the block succeeds.
+    # Publishers are serialized for the whole block, across processes when the config is shared, so work done
+    # in it (bringing stored deals forward) happens one version at a time and in version order.
+    global _current
+    with _write_lock:
+        if _shared is None:
+            previous = _current
+            snapshot = derive(previous, config, industry_multiples)
+            yield previous, snapshot
+            _current = snapshot
+            return
+        with _shared.transaction() as connection:
+            version, latest_config, latest_multiples = _shared.latest(connection)
+            previous = _current if _current.version == version else _freeze(version, latest_config, latest_multiples)
+            snapshot = derive(previous, config, industry_multiples)
+            _shared.publish(connection, snapshot)
+            yield previous, snapshot
+        _current = snapshot
+
+
+def publish(config=None, industry_multiples=None):
+    # Merges the given values into the current snapshot and publishes the result as a new version
+    with publishing(config, industry_multiples) as (_, snapshot):
+        pass
+    return snapshot
+
+
+def refresh():
+    # Installs the newest shared version if another process published it
+    global _current
+    if _shared is None or not _shared.changed():
+        return _current
+    version, config, industry_multiples = _shared.latest()
+    if version > _current.version:
+        snapshot = _freeze(version, config, industry_multiples)
+        with _write_lock:
+            if version > _current.version:
+                _current = snapshot
+    return _current
+
+
+class ConfigWatcher:
+    # Background thread that keeps this process within one poll interval of the shared config
+
+    def __init__(self, interval=CONFIG_POLL_INTERVAL):
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="deal-config-watcher", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                refresh()
+            except sqlite3.Error:
+                # A busy or briefly unavailable file is retried on the next tick
+                pass
+
+
+def watch_config(interval=CONFIG_POLL_INTERVAL):
+    # Started by each server process; there is nothing to watch when the config is not shared
+    if _shared is None:
+        return None
+    return ConfigWatcher(interval).start()
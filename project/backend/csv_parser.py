@@ -0,0 +1,207 @@
+import csv
+import io
+from operator import itemgetter
+from dataclasses import dataclass, field
+from typing import Dict, List
+
+import numpy as np
+
+from batch import NUMERIC_COLUMNS, DealColumns
+
+REQUIRED_COLUMNS = (
+    "company_name", "industry", "ask", "valuation_cap", "security_type", "discount_rate", "interest", "yearly_revenue",
+)
+# Numeric columns that may be absent or blank; they default to 0.0 like the DealData optionals
+OPTIONAL_NUMERIC = ("monthly_burn", "current_cash")
+
+
+class CSVFormatError(ValueError):
+    pass
+
+
+# Typed columns for the rows that parsed, plus line-numbered errors for the ones that did not
+@dataclass
+class ParsedCSV:
+    columns: DealColumns
+    line_numbers: np.ndarray
+    errors: List[Dict] = field(default_factory=list)
+
+
+def resolve_header(header):
+    index = {name.strip(): position for position, name in enumerate(header)}
+    missing = [name for name in REQUIRED_COLUMNS if name not in index]
+    if missing:
+        raise CSVFormatError(f"CSV is missing required columns: {', '.join(missing)}")
+    return index
+
+
+def _parse_numeric(values, optional, bad, messages, name):
+    # Fast path converts the whole column at once; only a failing column is re-parsed value by value
+    try:
+        if optional:
+            return np.array([float(value) if value else 0.0 for value in values], dtype=np.float64)
+        return np.array(list(map(float, values)), dtype=np.float64)
+    except ValueError:
+        pass
+    column = np.zeros(len(values), dtype=np.float64)
+    for i, value in enumerate(values):
+        if optional and not value:
+            continue
+        try:
+            column[i] = float(value)
+        except ValueError:
+            bad[i] = True
+            messages.setdefault(i, f"{name}: could not convert {value!r} to float")
+    return column
+
+
+def _parse_revenue(cells, bad, messages):
+    # All revenue lists are joined and converted in one pass into a flat buffer plus offsets
+    lengths = np.fromiter((cell.count(",") + 1 for cell in cells), dtype=np.int64, count=len(cells))
+    try:
+        revenue = np.array(",".join(cells).split(","), dtype=np.float64) if cells else np.zeros(0)
+        return revenue, lengths
+    except ValueError:
+        pass
+    parts = []
+    for i, cell in enumerate(cells):
+        try:
+            parts.append([float(value) for value in cell.split(",")])
+        except ValueError:
+            bad[i] = True
+            messages.setdefault(i, f"yearly_revenue: could not parse {cell!r}")
+            parts.append([])
+    lengths = np.fromiter(map(len, parts), dtype=np.int64, count=len(parts))
+    revenue = np.fromiter((value for part in parts for value in part), dtype=np.float64, count=int(lengths.sum()))
+    return revenue, lengths
+
+
+def parse_rows(rows, line_numbers, index):
+    # rows are csv.reader lists; index maps column names to positions from resolve_header
+    width = max(index.values()) + 1
+    short = [i for i, row in enumerate(rows) if len(row) < width]
+    bad = np.zeros(len(rows), dtype=bool)
+    messages = {}
+    for i in short:
+        bad[i] = True
+        messages[i] = f"expected at least {width} fields, found {len(rows[i])}"
+        rows[i] = rows[i] + [""] * (width - len(rows[i]))
+
+    def cells(name):
+        position = index.get(name)
+        if position is None:
+            return [""] * len(rows)
+        return list(map(itemgetter(position), rows))
+
+    numeric = {
+        name: _parse_numeric(cells(name), name in OPTIONAL_NUMERIC, bad, messages, name) for name in NUMERIC_COLUMNS
+    }
+    revenue, lengths = _parse_revenue(cells("yearly_revenue"), bad, messages)
+    offsets = np.zeros(len(rows) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    company_name = np.array(cells("company_name"), dtype=object)
+    columns = DealColumns(
+        company_name=company_name,
+        industry=np.array(cells("industry"), dtype=object),
+        security_type=np.array(cells("security_type"), dtype=object),
+        revenue=revenue,
+        revenue_offsets=offsets,
+        **numeric,
+    )
+
+    line_numbers = np.asarray(line_numbers, dtype=np.int64)
+    errors = [
+        {"line": int(line_numbers[i]), "company_name": company_name[i], "error": messages[i]}
+        for i in sorted(messages)
+    ]
+    if bad.any():
+        good = np.flatnonzero(~bad)
+        columns = columns.take(good)
+        line_numbers = line_numbers[good]
+    return ParsedCSV(columns=columns, line_numbers=line_numbers, errors=errors)
+
+
+# Field order used when deal dicts are parsed like CSV rows
+RECORD_FIELDS = REQUIRED_COLUMNS + OPTIONAL_NUMERIC
+RECORD_INDEX = {name: position for position, name in enumerate(RECORD_FIELDS)}
+
+
+def _cell(value):
+    # A JSON value as the text its CSV cell would hold; revenue lists are comma-joined like the CSV column
+    if value is None:
+        return ""
+    if isinstance(value, list):
+        return ",".join(map(str, value))
+    return str(value)
+
+
+def parse_records(records, line_numbers, errors=()):
+    # Deal dicts, such as JSON lines, through the same conversion and validation as CSV rows; errors are
+    # line-numbered errors the caller already found and are merged in line order
+    rows = []
+    kept = []
+    errors = list(errors)
+    for record, line in zip(records, line_numbers):
+        missing = [name for name in REQUIRED_COLUMNS if name not in record]
+        if missing:
+            message = f"missing fields: {', '.join(missing)}"
+            errors.append({"line": line, "company_name": record.get("company_name"), "error": message})
+            continue
+        rows.append([_cell(record.get(name)) for name in RECORD_FIELDS])
+        kept.append(line)
+    parsed = parse_rows(rows, kept, RECORD_INDEX)
+    if errors:
+        parsed.errors = sorted(errors + parsed.errors, key=lambda error: error["line"])
+    return parsed
+
+
+def read_rows(reader):
+    # When every record is one non-blank line, line numbers follow directly from the row count
+    first_line = reader.line_num + 1
+    rows = list(reader)
+    if reader.line_num - first_line + 1 == len(rows) and all(rows):
+        return rows, range(first_line, first_line + len(rows))
+
+    # Otherwise re-walk the records to account for blank lines and quoted newlines
+    line_numbers = []
+    line = first_line - 1
+    kept = []
+    for row in rows:
+        line += 1 if not row else 1 + sum(field.count("\n") for field in row)
+        if row:
+            kept.append(row)
+            line_numbers.append(line)
+    return kept, line_numbers
+
+
+def iter_row_chunks(reader, size):
+    # read_rows for files too large to hold at once: up to size records at a time, each numbered by the line
+    # it ends on, which is what read_rows counts too
+    rows = []
+    line_numbers = []
+    for row in reader:
+        if not row:
+            continue
+        rows.append(row)
+        line_numbers.append(reader.line_num)
+        if len(rows) == size:
+            yield rows, line_numbers
+            rows = []
+            line_numbers = []
+    if rows:
+        yield rows, line_numbers
+
+
+def open_deal_csv(file):
+    # csv.reader over a text file positioned after its header, with the header resolved
+    reader = csv.reader(file)
+    header = next(reader, None)
+    if header is None:
+        raise CSVFormatError("CSV is empty")
+    return reader, resolve_header(header)
+
+
+def parse_deal_csv(text):
+    reader, index = open_deal_csv(io.StringIO(text, newline=""))
+    rows, line_numbers = read_rows(reader)
+    return parse_rows(rows, line_numbers, index)
@@ -0,0 +1,307 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+from batch import (
+    ASSESSMENT_LABELS,
+    DEPENDENCIES,
+    NUMERIC_COLUMNS,
+    assess_discount,
+    assess_interest,
+    assess_runway,
+    assess_valuation,
+    to_float,
+)
+from config_store import publishing
+from lookup import encode_securities
+
+# Evaluated deals are kept in SQLite, one row per company, tagged with the config version that produced them
+DEALS_DB = os.environ.get("DEAL_STORE_DB", "deals.sqlite3")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS deals (
+    company_name TEXT PRIMARY KEY,
+    industry TEXT NOT NULL,
+    security_type TEXT NOT NULL,
+    ask REAL NOT NULL,
+    valuation_cap REAL NOT NULL,
+    discount_rate REAL NOT NULL,
+    interest REAL NOT NULL,
+    monthly_burn REAL NOT NULL,
+    current_cash REAL NOT NULL,
+    yearly_revenue TEXT NOT NULL,
+    growth_rates TEXT NOT NULL,
+    implied_multiple REAL,
+    months_of_cash REAL,
+    discount_rate_assessment INTEGER NOT NULL,
+    interest_rate_assessment INTEGER NOT NULL,
+    valuation_assessment INTEGER NOT NULL,
+    runway_assessment INTEGER NOT NULL,
+    config_version INTEGER NOT NULL,
+    evaluated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS deals_industry ON deals (industry);
+CREATE INDEX IF NOT EXISTS deals_security_type ON deals (security_type);
+CREATE INDEX IF NOT EXISTS deals_discount_rate_assessment ON deals (discount_rate_assessment);
+CREATE INDEX IF NOT EXISTS deals_interest_rate_assessment ON deals (interest_rate_assessment);
+CREATE INDEX IF NOT EXISTS deals_valuation_assessment ON deals (valuation_assessment, industry);
+CREATE INDEX IF NOT EXISTS deals_runway_assessment ON deals (runway_assessment);
+CREATE INDEX IF NOT EXISTS deals_config_version ON deals (config_version);
+"""
+
+# Assessment columns are stored as codes into batch.ASSESSMENT_LABELS; queries and results use the labels
+SORTABLE = (
+    "company_name", "industry", "security_type", "ask", "valuation_cap", "implied_multiple", "months_of_cash",
+    "config_version", "evaluated_at",
+)
+
+
+def _reassess_discount(security_type, discount_rate, snapshot):
+    return assess_discount(encode_securities(security_type), np.array(discount_rate), snapshot.config)
+
+
+def _reassess_interest(security_type, interest, snapshot):
+    return assess_interest(encode_securities(security_type), np.array(interest), snapshot.config)
+
+
+def _reassess_valuation(industry, implied_multiple, snapshot):
+    # A NULL implied multiple becomes NaN, which assess_valuation treats as Incomplete
+    implied_multiple = np.array(implied_multiple, dtype=np.float64)
+    return assess_valuation(implied_multiple, snapshot.tables.encode_industries(industry), snapshot.tables)
+
+
+def _reassess_runway(months_of_cash, snapshot):
+    return assess_runway(np.array(months_of_cash, dtype=np.float64), snapshot.config)
+
+
+# Stored columns each assessment is recomputed from
+REASSESS = {
+    "discount_rate_assessment": (("security_type", "discount_rate"), _reassess_discount),
+    "interest_rate_assessment": (("security_type", "interest"), _reassess_interest),
+    "valuation_assessment": (("industry", "implied_multiple"), _reassess_valuation),
+    "runway_assessment": (("months_of_cash",), _reassess_runway),
+}
+INPUT_COLUMNS = ("company_name", "industry", "security_type") + NUMERIC_COLUMNS + ("yearly_revenue",)
+COLUMNS = INPUT_COLUMNS + (
+    "growth_rates", "implied_multiple", "months_of_cash", "discount_rate_assessment", "interest_rate_assessment",
+    "valuation_assessment", "runway_assessment", "config_version", "evaluated_at",
+)
+
+
+def _nullable(value):
+    # NaN marks a missing implied multiple or months of cash
+    return None if value != value else value
+
+
+def _store_row(inputs, row, version, now):
+    # inputs follow INPUT_COLUMNS, with yearly_revenue as a list; row is a batch.MetricsRow
+    return (
+        *inputs[:-1],
+        json.dumps(list(inputs[-1])),
+        json.dumps(list(row.growth_rates)),
+        _nullable(row.implied_multiple),
+        _nullable(row.months_of_cash),
+        row.discount,
+        row.interest,
+        row.valuation,
+        row.runway,
+        version,
+        now,
+    )
+
+
+class DealStore:
+    # One SQLite connection per thread, like jobs.JobStore
+
+    def __init__(self, path=DEALS_DB):
+        self.path = path
+        self._local = threading.local()
+        with self._connect() as connection:
+            connection.executescript(SCHEMA)
+
+    def _connect(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30)
+            connection.row_factory = sqlite3.Row
+            connection.execute("PRAGMA journal_mode=WAL")
+            self._local.connection = connection
+        return connection
+
+    def record(self, deals, version):
+        # deals yields (inputs, MetricsRow) pairs; a company that is evaluated again replaces its old row
+        now = time.time()
+        placeholders = ", ".join("?" * len(COLUMNS))
+        with self._connect() as connection:
+            connection.executemany(
+                f"INSERT OR REPLACE INTO deals ({', '.join(COLUMNS)}) VALUES ({placeholders})",
+                (_store_row(inputs, row, version, now) for inputs, row in deals),
+            )
+
+    def record_batch(self, columns, batch, version):
+        revenue = columns.revenue.tolist()
+        offsets = columns.revenue_offsets.tolist()
+        inputs = zip(
+            columns.company_name.tolist(),
+            columns.industry.tolist(),
+            columns.security_type.tolist(),
+            *(getattr(columns, name).tolist() for name in NUMERIC_COLUMNS),
+            (revenue[offsets[i]:offsets[i + 1]] for i in range(len(columns))),
+        )
+        self.record(
+            ((deal, row) for i, (deal, row) in enumerate(zip(inputs, batch.rows())) if i not in batch.errors),
+            version,
+        )
+
+    def record_deal(self, record, row, version):
+        inputs = tuple(to_float(record.get(name)) if name in NUMERIC_COLUMNS else record[name] for name in INPUT_COLUMNS)
+        self.record([(inputs, row)], version)
+
+    @staticmethod
+    def filter_clauses(filters):
+        # filters map column names to values; assessment filters take labels
+        clauses = []
+        parameters = []
+        for name, value in (filters or {}).items():
+            if value is None:
+                continue
+            if name in ASSESSMENT_LABELS:
+                labels = ASSESSMENT_LABELS[name]
+                if value not in labels:
+                    raise ValueError(f"Unknown {name} {value!r}")
+                value = labels.index(value)
+            elif name not in ("industry", "security_type", "config_version"):
+                raise ValueError(f"Cannot filter on {name!r}")
+            clauses.append(f"{name} = ?")
+            parameters.append(value)
+        return clauses, parameters
+
+    def query(self, filters=None, sort="company_name", descending=False, offset=0, limit=100):
+        clauses, parameters = self.filter_clauses(filters)
+        if sort not in SORTABLE:
+            raise ValueError(f"Cannot sort on {sort!r}")
+
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        connection = self._connect()
+        total = connection.execute(f"SELECT COUNT(*) FROM deals {where}", parameters).fetchone()[0]
+        rows = connection.execute(
+            f"SELECT * FROM deals {where} ORDER BY {sort} {'DESC' if descending else 'ASC'}, company_name"
+            " LIMIT ? OFFSET ?",
+            (*parameters, limit, offset),
+        )
+        return total, [self._describe(row) for row in rows]
+
+    def iter_pages(self, filters=None, page_size=10_000):
+        # Raw rows in company_name order, a page at a time; pages continue after the last name seen rather than
+        # using OFFSET, so each page is one index range scan however deep the export has got
+        clauses, parameters = self.filter_clauses(filters)
+        connection = self._connect()
+        last = None
+        while True:
+            where = clauses + (["company_name > ?"] if last is not None else [])
+            rows = connection.execute(
+                f"SELECT * FROM deals {'WHERE ' + ' AND '.join(where) if where else ''} ORDER BY company_name LIMIT ?",
+                (*parameters, *(() if last is None else (last,)), page_size),
+            ).fetchall()
+            if not rows:
+                break
+            yield rows
+            if len(rows) < page_size:
+                break
+            last = rows[-1]["company_name"]
+
+    def reassess(self, previous, snapshot):
+        # Brings rows evaluated under previous up to snapshot, recomputing only the assessments whose inputs
+        # changed and, for changed industry multiples, only the deals in those industries
+        changed_keys = {key for key in snapshot.config if previous.config.get(key) != snapshot.config[key]}
+        old, new = previous.industry_multiples, snapshot.industry_multiples
+        industries = sorted(name for name in set(old) | set(new) if old.get(name, ...) != new.get(name, ...))
+
+        stale = {name: ("", ()) for name, keys in DEPENDENCIES.items() if changed_keys.intersection(keys)}
+        if "valuation_assessment" not in stale and industries:
+            stale["valuation_assessment"] = (
+                f"AND industry IN ({', '.join('?' * len(industries))})", tuple(industries),
+            )
+
+        changed = dict.fromkeys(stale, 0)
+        changed_deals = set()
+        with self._connect() as connection:
+            for name, (where, parameters) in stale.items():
+                flipped = self._reassess_rows(
+                    connection, name, f"config_version = ? {where}", (previous.version, *parameters), snapshot
+                )
+                changed[name] = len(flipped)
+                changed_deals.update(flipped)
+            # Rows tagged with an older version were evaluated before an earlier update but stored after it, so
+            # that update never saw them; the diff above does not cover them and every assessment is redone
+            behind = connection.execute(
+                "SELECT COUNT(*) FROM deals WHERE config_version < ?", (previous.version,)
+            ).fetchone()[0]
+            if behind:
+                for name in REASSESS:
+                    flipped = self._reassess_rows(connection, name, "config_version < ?", (previous.version,), snapshot)
+                    changed[name] = changed.get(name, 0) + len(flipped)
+                    changed_deals.update(flipped)
+            updated = connection.execute(
+                "UPDATE deals SET config_version = ? WHERE config_version <= ?", (snapshot.version, previous.version)
+            ).rowcount
+        return {
+            "config_version": snapshot.version,
+            "deals_updated": updated,
+            "reassessed": sorted(set(stale) | (set(REASSESS) if behind else set())),
+            "changed": changed,
+            "changed_deals": len(changed_deals),
+            "behind_deals": behind,
+        }
+
+    @staticmethod
+    def _reassess_rows(connection, name, condition, parameters, snapshot):
+        # Recomputes one assessment for the rows matching condition; returns the deals whose code changed
+        inputs, assess = REASSESS[name]
+        rows = connection.execute(
+            f"SELECT company_name, {name}, {', '.join(inputs)} FROM deals WHERE {condition}", parameters
+        ).fetchall()
+        if not rows:
+            return []
+        company_names, codes, *values = zip(*rows)
+        fresh = assess(*values, snapshot)
+        flipped = np.flatnonzero(fresh != np.array(codes)).tolist()
+        connection.executemany(
+            f"UPDATE deals SET {name} = ? WHERE company_name = ?",
+            [(int(fresh[i]), company_names[i]) for i in flipped],
+        )
+        return [company_names[i] for i in flipped]
+
+    @staticmethod
+    def _describe(row):
+        deal = {name: row[name] for name in INPUT_COLUMNS[:-1]}
+        deal["yearly_revenue"] = json.loads(row["yearly_revenue"])
+        deal["metrics"] = {
+            "growth_rates": json.loads(row["growth_rates"]),
+            "implied_multiples": row["implied_multiple"],
+            **{name: labels[row[name]] for name, labels in ASSESSMENT_LABELS.items()},
+        }
+        deal["config_version"] = row["config_version"]
+        deal["evaluated_at"] = row["evaluated_at"]
+        return deal
+
+
+_store = None
+
+
+def get_deal_store():
+    global _store
+    if _store is None:
+        _store = DealStore()
+    return _store
+
+
+def publish_and_reassess(config=None, industry_multiples=None):
+    # The new version only goes live once stored deals have been brought forward to it
+    with publishing(config=config, industry_multiples=industry_multiples) as (previous, snapshot):
+        report = get_deal_store().reassess(previous, snapshot)
+    return snapshot, report
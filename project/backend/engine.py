@@ -0,0 +1,151 @@
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import List, Mapping
+
+from batch import evaluate_batch, pack_deal
+from config_store import current_snapshot
+from lookup import DISCOUNT_APPLIES, INTEREST_APPLIES, LookupTables, security_code
+
+# Evaluation core shared by the web service, the offline CLI and the top-level Deal.py. Deal is the one-deal
+# reference implementation; batches go through batch.evaluate_batch, which produces the same results per row.
+
+
+# Define the Deal dataclass
+@dataclass
+class Deal:
+    company_name: str = ""
+    industry: str = ""
+    ask: float = 0.0
+    valuation_cap: float = 0.0
+    security_type: str = ""
+    discount_rate: float = 0.0
+    interest: float = 0.0
+    yearly_revenue: List[float] = field(default_factory=list)
+    monthly_burn: float = 0.0
+    current_cash: float = 0.0
+    previous_raise: float = 0.0
+    months_of_cash: float = 0.0
+    config: Mapping[str, float] = field(default_factory=lambda: current_snapshot().config)
+    tables: LookupTables = field(default_factory=lambda: current_snapshot().tables)
+
+    # Calculated metrics
+    growth_rates: List[float] = field(default_factory=list)
+    growth_rate_assessment: List[str] = field(default_factory=list)
+    implied_multiple: float = None
+    assessment_discount_rate: str = ""
+    assessment_deal_interest: str = ""
+    valuation_assessment: str = ""
+    runway_assessment: str = ""
+
+    def calculate_revenue_growth_rates(self):
+        self.growth_rates = [
+            (self.yearly_revenue[i] - self.yearly_revenue[i - 1]) / self.yearly_revenue[i - 1] * 100
+            for i in range(1, len(self.yearly_revenue))
+        ]
+
+    def assess_growth_rate(self):
+        self.growth_rate_assessment = []
+        for growth_rate in self.growth_rates:
+            if growth_rate >= self.config["modeled_revenue_growth_aggressive"] * 100:
+                self.growth_rate_assessment.append("Aggressive")
+            elif growth_rate >= self.config["modeled_revenue_growth_standard"] * 100:
+                self.growth_rate_assessment.append("Standard")
+            else:
+                self.growth_rate_assessment.append("Low")
+
+    def calculate_metrics(self):
+        self.calculate_revenue_growth_rates()
+        self.assess_growth_rate()
+
+        # Implied Multiple
+        self.implied_multiple = self.valuation_cap / self.yearly_revenue[0] if self.yearly_revenue[0] != 0 else None
+
+        # Discount Rate Assessment
+        security = security_code(self.security_type)
+        if DISCOUNT_APPLIES[security]:
+            if self.discount_rate == 0:
+                self.assessment_discount_rate = "Zero Discount"
+            elif self.discount_rate < self.config["modeled_discount_rate"]:
+                self.assessment_discount_rate = "Lower Discount"
+            elif self.discount_rate == self.config["modeled_discount_rate"]:
+                self.assessment_discount_rate = "Standard Discount"
+            else:
+                self.assessment_discount_rate = "Higher Discount"
+        else:
+            self.assessment_discount_rate = "Does not apply"
+
+        # Interest Rate Assessment
+        if INTEREST_APPLIES[security]:
+            if self.interest == 0:
+                self.assessment_deal_interest = "Zero Interest"
+            elif self.interest < self.config["modeled_interest_rate"]:
+                self.assessment_deal_interest = "Lower Interest"
+            elif self.interest == self.config["modeled_interest_rate"]:
+                self.assessment_deal_interest = "Standard Interest"
+            else:
+                self.assessment_deal_interest = "Higher Interest"
+        else:
+            self.assessment_deal_interest = "Does not apply"
+
+        # Valuation Assessment
+        industry = self.tables.industry_code(self.industry)  # Unlisted industries use the 3.0 default
+        if self.implied_multiple is None or self.tables.no_benchmark[industry]:
+            self.valuation_assessment = "Incomplete"
+        elif self.implied_multiple > self.tables.high_cutoffs[industry]:
+            self.valuation_assessment = "High Valuation"
+        elif self.implied_multiple >= self.tables.fair_cutoffs[industry]:
+            self.valuation_assessment = "Fair Valuation"
+        else:
+            self.valuation_assessment = "Favorable Valuation"
+
+        # Runway Assessment
+        if self.monthly_burn == 0:
+            self.runway_assessment = "Unknown"
+        else:
+            self.months_of_cash = self.current_cash / self.monthly_burn
+            if self.months_of_cash > self.config["modeled_cash_months"]:
+                self.runway_assessment = "Adequate"
+            else:
+                self.runway_assessment = "Inadequate"
+
+        return {
+            "growth_rates": self.growth_rates,
+            "implied_multiples": self.implied_multiple,
+            "discount_rate_assessment": self.assessment_discount_rate,
+            "interest_rate_assessment": self.assessment_deal_interest,
+            "valuation_assessment": self.valuation_assessment,
+            "runway_assessment": self.runway_assessment,
+        }
+
+
+def evaluate_record(record, config=None, tables=None):
+    # One deal dict (DealData fields) to a batch.MetricsRow
+    snapshot = current_snapshot()
+    config = snapshot.config if config is None else config
+    tables = snapshot.tables if tables is None else tables
+    deal = Deal(**record, config=config, tables=tables)
+    deal.calculate_metrics()
+    return pack_deal(deal)
+
+
+def evaluate_chunks(chunks, snapshot=None, workers=1):
+    # Yields (chunk, BatchResult) in input order for an iterable of ParsedCSV-like chunks, all against one
+    # snapshot. With several workers, chunks are evaluated in worker processes and at most two per worker are
+    # in flight, so memory stays bounded however long the input is.
+    snapshot = snapshot or current_snapshot()
+    if workers <= 1:
+        for chunk in chunks:
+            yield chunk, evaluate_batch(chunk.columns, snapshot.config, snapshot.industry_multiples, snapshot.tables)
+        return
+
+    config = dict(snapshot.config)
+    multiples = dict(snapshot.industry_multiples)
+    pending = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for chunk in chunks:
+            pending.append((chunk, executor.submit(evaluate_batch, chunk.columns, config, multiples)))
+            if len(pending) >= 2 * workers:
+                done, future = pending.pop(0)
+                yield done, future.result()
+        for done, future in pending:
+            yield done, future.result()
@@ -0,0 +1,267 @@
+import csv
+import io
+import json
+
+import numpy as np
+
+from batch import ASSESSMENTS, NUMERIC_COLUMNS, BatchResult, DealColumns
+from config_store import current_snapshot
+from streaming import STREAM_CHUNK_SIZE, evaluate_snapshot, iter_csv_batches, iter_upload_chunks
+
+# pyarrow is optional; without it only the flat CSV export is available
+try:
+    import pyarrow as pa
+    import pyarrow.ipc
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+FORMATS = ("parquet", "arrow", "csv")
+MEDIA_TYPES = {
+    "parquet": "application/vnd.apache.parquet",
+    "arrow": "application/vnd.apache.arrow.stream",
+    "csv": "text/csv",
+}
+EXTENSIONS = {"parquet": ".parquet", "arrow": ".arrows", "csv": ".csv"}
+
+COLUMNS = (
+    ("line", "company_name", "industry", "security_type") + NUMERIC_COLUMNS
+    + ("yearly_revenue", "growth_rates", "implied_multiple", "months_of_cash")
+    + tuple(name for name, _, _ in ASSESSMENTS) + ("error",)
+)
+
+if pa is not None:
+    SCHEMA = pa.schema(
+        [
+            ("line", pa.int64()),
+            ("company_name", pa.string()),
+            ("industry", pa.string()),
+            ("security_type", pa.string()),
+            *((name, pa.float64()) for name in NUMERIC_COLUMNS),
+            ("yearly_revenue", pa.list_(pa.float64())),
+            ("growth_rates", pa.list_(pa.float64())),
+            ("implied_multiple", pa.float64()),
+            ("months_of_cash", pa.float64()),
+            *((name, pa.dictionary(pa.int8(), pa.string())) for name, _, _ in ASSESSMENTS),
+            ("error", pa.string()),
+        ]
+    )
+
+
+def default_format():
+    return "parquet" if pa is not None else "csv"
+
+
+def check_format(export_format):
+    if export_format not in FORMATS:
+        raise ValueError(f"Unknown export format {export_format!r}, expected one of {', '.join(FORMATS)}")
+    if export_format != "csv" and pa is None:
+        raise ValueError(f"The {export_format} export needs pyarrow; install it or use the csv format")
+
+
+def _failed(columns, batch):
+    failed = np.zeros(len(columns), dtype=bool)
+    failed[list(batch.errors)] = True
+    return failed
+
+
+def _list_array(values, offsets, mask=None):
+    # Zero-copy list column from a flat buffer plus offsets
+    return pa.ListArray.from_arrays(pa.array(offsets.astype(np.int32)), pa.array(values), mask=mask)
+
+
+def record_batch(columns, batch, line_numbers=None):
+    # One Arrow record batch per evaluated chunk; rows in batch.errors keep their inputs and carry the error
+    failed = _failed(columns, batch)
+    mask = pa.array(failed) if failed.any() else None
+    n = len(columns)
+    arrays = [
+        pa.array(line_numbers, type=pa.int64()) if line_numbers is not None else pa.nulls(n, pa.int64()),
+        pa.array(columns.company_name, type=pa.string()),
+        pa.array(columns.industry, type=pa.string()),
+        pa.array(columns.security_type, type=pa.string()),
+        *(pa.array(getattr(columns, name)) for name in NUMERIC_COLUMNS),
+        _list_array(columns.revenue, columns.revenue_offsets),
+        _list_array(batch.growth_rates, batch.growth_offsets, mask),
+        pa.array(batch.implied_multiple, mask=np.isnan(batch.implied_multiple) | failed),
+        pa.array(batch.months_of_cash, mask=np.isnan(batch.months_of_cash) | failed),
+        *(
+            pa.DictionaryArray.from_arrays(pa.array(getattr(batch, codes), mask=failed), pa.array(labels))
+            for _, codes, labels in ASSESSMENTS
+        ),
+        pa.array([batch.errors.get(i) for i in range(n)] if batch.errors else pa.nulls(n, pa.string()), pa.string()),
+    ]
+    return pa.record_batch(arrays, schema=SCHEMA)
+
+
+def error_batch(errors):
+    # Rows that did not parse have only a line, a company name and an error
+    values = {
+        "line": [error["line"] for error in errors],
+        "company_name": [error["company_name"] for error in errors],
+        "error": [error["error"] for error in errors],
+    }
+    return pa.record_batch(
+        [
+            pa.array(values[field.name], field.type) if field.name in values else pa.nulls(len(errors), field.type)
+            for field in SCHEMA
+        ],
+        schema=SCHEMA,
+    )
+
+
+def _join(values):
+    # List cells use the same comma-separated form /upload-csv accepts for yearly_revenue
+    return ",".join(map(repr, values))
+
+
+def csv_rows(columns, batch, line_numbers=None):
+    revenue = columns.revenue.tolist()
+    revenue_offsets = columns.revenue_offsets.tolist()
+    growth_rates = batch.growth_rates.tolist()
+    growth_offsets = batch.growth_offsets.tolist()
+    implied = batch.implied_multiple.tolist()
+    months = batch.months_of_cash.tolist()
+    lines = line_numbers if line_numbers is not None else [""] * len(columns)
+    inputs = zip(
+        lines,
+        columns.company_name.tolist(),
+        columns.industry.tolist(),
+        columns.security_type.tolist(),
+        *(getattr(columns, name).tolist() for name in NUMERIC_COLUMNS),
+    )
+    codes = zip(*(getattr(batch, codes).tolist() for _, codes, _ in ASSESSMENTS))
+    for i, (row, assessments) in enumerate(zip(inputs, codes)):
+        row = list(row)
+        row.append(_join(revenue[revenue_offsets[i]:revenue_offsets[i + 1]]))
+        if i in batch.errors:
+            row.extend([""] * (3 + len(ASSESSMENTS)))
+            row.append(batch.errors[i])
+        else:
+            row.append(_join(growth_rates[growth_offsets[i]:growth_offsets[i + 1]]))
+            row.append("" if implied[i] != implied[i] else implied[i])
+            row.append("" if months[i] != months[i] else months[i])
+            row.extend(labels[code] for code, (_, _, labels) in zip(assessments, ASSESSMENTS))
+            row.append("")
+        yield row
+
+
+class _Sink:
+    # File-like target for the Arrow writers; whatever they write is handed out after each row group
+
+    closed = False
+
+    def __init__(self):
+        self._parts = []
+        self._position = 0
+
+    def write(self, data):
+        self._parts.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b"".join(self._parts)
+        self._parts = []
+        return data
+
+
+class ExportWriter:
+    # Encodes evaluated chunks one row group at a time; every call returns the bytes ready to send or write
+
+    def __init__(self, export_format):
+        check_format(export_format)
+        self.format = export_format
+        self._sink = _Sink()
+        self._writer = None
+        if export_format == "parquet":
+            self._writer = pq.ParquetWriter(self._sink, SCHEMA)
+        elif export_format == "arrow":
+            self._writer = pa.ipc.new_stream(self._sink, SCHEMA)
+        else:
+            self._text = io.StringIO()
+            self._csv = csv.writer(self._text)
+            self._csv.writerow(COLUMNS)
+
+    def write(self, columns, batch, line_numbers=None, errors=()):
+        # errors are rows that failed to parse, as reported by csv_parser.ParsedCSV
+        if self._writer is not None:
+            batches = [record_batch(columns, batch, line_numbers)] if len(columns) else []
+            if errors:
+                batches.append(error_batch(errors))
+            if batches:
+                # One table per call keeps a chunk's parse errors in its own Parquet row group
+                self._writer.write_table(pa.Table.from_batches(batches, schema=SCHEMA))
+            return self._sink.drain()
+        self._csv.writerows(csv_rows(columns, batch, line_numbers))
+        for error in errors:
+            self._csv.writerow(
+                [error["line"], error["company_name"]] + [""] * (len(COLUMNS) - 3) + [error["error"]]
+            )
+        return self._drain_text()
+
+    def write_parsed(self, parsed, batch):
+        return self.write(parsed.columns, batch, parsed.line_numbers, parsed.errors)
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            return self._sink.drain()
+        return self._drain_text()
+
+    def _drain_text(self):
+        data = self._text.getvalue().encode("utf-8")
+        self._text.seek(0)
+        self._text.truncate()
+        return data
+
+
+def stored_chunk(rows):
+    # DealColumns and BatchResult for a page of deal store rows, using the stored results as they are
+    records = [dict(row, yearly_revenue=json.loads(row["yearly_revenue"])) for row in rows]
+    columns = DealColumns.from_records(records)
+    growth = [json.loads(row["growth_rates"]) for row in rows]
+    growth_offsets = np.zeros(len(rows) + 1, dtype=np.int64)
+    np.cumsum([len(rates) for rates in growth], out=growth_offsets[1:])
+    growth_rates = np.fromiter((rate for rates in growth for rate in rates), dtype=np.float64, count=growth_offsets[-1])
+    batch = BatchResult(
+        growth_rates=growth_rates,
+        growth_offsets=growth_offsets,
+        growth_codes=np.zeros(len(growth_rates), dtype=np.int8),
+        implied_multiple=np.array([row["implied_multiple"] for row in rows], dtype=np.float64),
+        discount_codes=np.array([row["discount_rate_assessment"] for row in rows], dtype=np.int8),
+        interest_codes=np.array([row["interest_rate_assessment"] for row in rows], dtype=np.int8),
+        valuation_codes=np.array([row["valuation_assessment"] for row in rows], dtype=np.int8),
+        runway_codes=np.array([row["runway_assessment"] for row in rows], dtype=np.int8),
+        months_of_cash=np.array([row["months_of_cash"] for row in rows], dtype=np.float64),
+        errors={},
+    )
+    return columns, batch
+
+
+async def stream_export(file, export_format, chunk_size=STREAM_CHUNK_SIZE):
+    # Upload counterpart of stream_evaluations: one row group per chunk of the upload, against one config snapshot
+    from instrumentation import count_rows
+
+    snapshot = current_snapshot()
+    writer = ExportWriter(export_format)
+    async for parsed in iter_csv_batches(iter_upload_chunks(file, chunk_size)):
+        count_rows(len(parsed.columns) + len(parsed.errors))
+        batch = await evaluate_snapshot(parsed.columns, snapshot)
+        yield writer.write_parsed(parsed, batch)
+    yield writer.close()
+
+
+def iter_stored_export(store, export_format, filters=None, page_size=10_000):
+    # Stored deals as they were last assessed, one row group per page of the deal store
+    writer = ExportWriter(export_format)
+    for rows in store.iter_pages(filters, page_size):
+        columns, batch = stored_chunk(rows)
+        yield writer.write(columns, batch)
+    yield writer.close()
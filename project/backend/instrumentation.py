@@ -0,0 +1,335 @@
+import asyncio
+import contextvars
+import functools
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
+
+from fastapi.routing import APIRoute
+
+# Latency buckets in seconds, shared by the request and stage histograms
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+# The sampling profiler is off unless enabled here or through PUT /profiler
+PROFILER_ENABLED = os.environ.get("DEAL_PROFILER", "") == "1"
+PROFILER_INTERVAL = float(os.environ.get("DEAL_PROFILER_INTERVAL", 0.005))
+PROFILES_KEPT = 20
+PROFILE_HEADER = b"x-profile"
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _label_text(names, values, extra=()):
+    pairs = [*zip(names, values), *extra]
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+class Metric:
+    # One named metric with a value per label combination, rendered in the Prometheus text format
+    kind = "untyped"
+
+    def __init__(self, name, description, labels=()):
+        self.name = name
+        self.description = description
+        self.labels = labels
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for labels, value in items:
+            lines.extend(self._render_value(labels, value))
+        return lines
+
+    def _render_value(self, labels, value):
+        return [f"{self.name}{_label_text(self.labels, labels)} {value}"]
+
+
+class CounterMetric(Metric):
+    kind = "counter"
+
+    def inc(self, labels=(), amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def set(self, labels=(), value=0.0):
+        with self._lock:
+            self._values[labels] = value
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name, description, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, description, labels)
+        self.buckets = buckets
+
+    def observe(self, labels=(), value=0.0):
+        with self._lock:
+            entry = self._values.get(labels)
+            if entry is None:
+                entry = self._values[labels] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry[0][i] += 1
+                    break
+            entry[1] += value
+            entry[2] += 1
+
+    def _render_value(self, labels, value):
+        counts, total, count = value
+        lines = []
+        cumulative = 0
+        for bound, bucket in zip(self.buckets, counts):
+            cumulative += bucket
+            lines.append(f"{self.name}_bucket{_label_text(self.labels, labels, [('le', bound)])} {cumulative}")
+        lines.append(f"{self.name}_bucket{_label_text(self.labels, labels, [('le', '+Inf')])} {count}")
+        lines.append(f"{self.name}_sum{_label_text(self.labels, labels)} {total}")
+        lines.append(f"{self.name}_count{_label_text(self.labels, labels)} {count}")
+        return lines
+
+
+REQUEST_SECONDS = Histogram("deal_request_seconds", "Request latency by route", ("method", "route", "status"))
+STAGE_SECONDS = Histogram("deal_stage_seconds", "Time spent in each stage of the evaluation pipeline", ("stage",))
+ROWS_TOTAL = CounterMetric("deal_rows_total", "Deals evaluated, by route", ("route",))
+ROWS_PER_SECOND = Gauge("deal_rows_per_second", "Deals per second over the last request to each route", ("route",))
+# Background jobs run outside any request, so their rows are counted on their own
+JOB_ROWS_TOTAL = CounterMetric("deal_job_rows_total", "Deals evaluated by background jobs")
+METRICS = [REQUEST_SECONDS, STAGE_SECONDS, ROWS_TOTAL, ROWS_PER_SECOND, JOB_ROWS_TOTAL]
+
+
+def render_metrics():
+    lines = []
+    for metric in METRICS:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# Per-request state, visible to the route, the endpoint and the threadpool functions it calls
+class RequestState:
+    __slots__ = ("route", "stages", "rows", "endpoint_started", "endpoint_finished")
+
+    def __init__(self):
+        self.route = None
+        self.stages = []
+        self.rows = 0
+        self.endpoint_started = None
+        self.endpoint_finished = None
+
+
+_request = contextvars.ContextVar("deal_request", default=None)
+
+
+def observe_stage(name, seconds):
+    STAGE_SECONDS.observe((name,), seconds)
+    state = _request.get()
+    if state is not None:
+        state.stages.append((name, seconds))
+
+
+@contextmanager
+def stage(name):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(name, time.perf_counter() - started)
+
+
+def count_rows(rows):
+    # Rows handled by the current request; the middleware turns them into rows per second
+    state = _request.get()
+    if state is not None:
+        state.rows += rows
+
+
+def count_job_rows(rows):
+    JOB_ROWS_TOTAL.inc(amount=rows)
+
+
+def _timed_endpoint(endpoint):
+    # Marks when the endpoint itself starts and finishes, keeping its signature for FastAPI
+    if asyncio.iscoroutinefunction(endpoint):
+        @functools.wraps(endpoint)
+        async def timed(*args, **kwargs):
+            state = _request.get()
+            if state is not None:
+                state.endpoint_started = time.perf_counter()
+            try:
+                return await endpoint(*args, **kwargs)
+            finally:
+                if state is not None:
+                    state.endpoint_finished = time.perf_counter()
+    else:
+        @functools.wraps(endpoint)
+        def timed(*args, **kwargs):
+            state = _request.get()
+            if state is not None:
+                state.endpoint_started = time.perf_counter()
+            try:
+                return endpoint(*args, **kwargs)
+            finally:
+                if state is not None:
+                    state.endpoint_finished = time.perf_counter()
+    return timed
+
+
+class InstrumentedRoute(APIRoute):
+    # Splits each request into body parsing and validation, the endpoint, and response serialization
+
+    def __init__(self, path, endpoint, **kwargs):
+        super().__init__(path, _timed_endpoint(endpoint), **kwargs)
+
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+        route = self.path
+
+        async def instrumented(request):
+            state = _request.get()
+            if state is None:
+                return await handler(request)
+            state.route = route
+            started = time.perf_counter()
+            response = await handler(request)
+            finished = time.perf_counter()
+            if state.endpoint_started is not None and state.endpoint_finished is not None:
+                observe_stage("request_validation", state.endpoint_started - started)
+                observe_stage("serialization", finished - state.endpoint_finished)
+            return response
+
+        return instrumented
+
+
+class SamplingProfiler:
+    # Samples the stack of every thread running backend code while one request is in flight. Samples are
+    # folded into "outer;...;inner count" lines for flame graph tools. Work sent to the process pool is not seen.
+
+    def __init__(self, interval=PROFILER_INTERVAL):
+        self.interval = interval
+        self.samples = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="deal-profiler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        return "".join(f"{stack} {count}\n" for stack, count in self.samples.most_common())
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                relevant = False
+                while frame is not None:
+                    code = frame.f_code
+                    relevant = relevant or code.co_filename.startswith(BACKEND_DIR)
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                # Idle threads (the event loop waiting in select, parked pool workers) never run backend code
+                if relevant:
+                    self.samples[";".join(reversed(stack))] += 1
+
+
+class Profiles:
+    # Toggle for the profiler plus the most recent profiles, looked up by the id sent back in X-Profile-Id
+
+    def __init__(self, enabled=PROFILER_ENABLED, interval=PROFILER_INTERVAL, kept=PROFILES_KEPT):
+        self.enabled = enabled
+        self.interval = interval
+        self.kept = kept
+        self._profiles = OrderedDict()
+        self._lock = threading.Lock()
+
+    def configure(self, enabled, interval=None):
+        self.enabled = enabled
+        if interval is not None:
+            self.interval = interval
+
+    def add(self, profile_id, route, profile):
+        with self._lock:
+            self._profiles[profile_id] = (route, profile)
+            while len(self._profiles) > self.kept:
+                self._profiles.popitem(last=False)
+
+    def get(self, profile_id):
+        with self._lock:
+            return self._profiles.get(profile_id)
+
+    def status(self):
+        with self._lock:
+            recent = [{"profile_id": profile_id, "route": route} for profile_id, (route, _) in self._profiles.items()]
+        return {"enabled": self.enabled, "interval_ms": self.interval * 1000, "profiles": recent}
+
+
+profiles = Profiles()
+
+
+class MetricsMiddleware:
+    # Records latency per route and status for every HTTP request, adds a Server-Timing header with the
+    # stages the request went through, and profiles requests sent with "X-Profile: 1" when the profiler is on
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        state = RequestState()
+        token = _request.set(state)
+        profiler = None
+        profile_id = None
+        if profiles.enabled and dict(scope["headers"]).get(PROFILE_HEADER, b"") not in (b"", b"0", b"false"):
+            profile_id = uuid.uuid4().hex
+            profiler = SamplingProfiler(profiles.interval).start()
+        status = 500
+        started = time.perf_counter()
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers = list(message.get("headers", []))
+                if state.stages:
+                    timing = ", ".join(f"{name};dur={seconds * 1000:.3f}" for name, seconds in state.stages)
+                    headers.append((b"server-timing", timing.encode("latin-1")))
+                if profile_id is not None:
+                    headers.append((b"x-profile-id", profile_id.encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            elapsed = time.perf_counter() - started
+            route = state.route or "unmatched"
+            REQUEST_SECONDS.observe((scope["method"], route, str(status)), elapsed)
+            if state.rows:
+                ROWS_TOTAL.inc((route,), state.rows)
+                ROWS_PER_SECOND.set((route,), state.rows / elapsed if elapsed else 0.0)
+            if profiler is not None:
+                profiles.add(profile_id, route, profiler.stop())
+            _request.reset(token)
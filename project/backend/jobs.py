@@ -0,0 +1,278 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import CancelledError, ThreadPoolExecutor
+
+from batch import evaluate_batch
+from config_store import current_snapshot
+from csv_parser import iter_row_chunks, open_deal_csv, parse_rows
+from instrumentation import count_job_rows, stage
+from parallel import get_pool
+
+# Only used to pick one process to resume jobs; without it (Windows) every process resumes them
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# Job state lives in SQLite and uploads are kept on disk, so a restart resumes from the last committed chunk
+JOBS_DB = os.environ.get("DEAL_JOBS_DB", "jobs.sqlite3")
+JOBS_DIR = os.environ.get("DEAL_JOBS_DIR", "job_uploads")
+JOB_WORKERS = int(os.environ.get("DEAL_JOB_WORKERS", 2))
+JOB_CHUNK_SIZE = int(os.environ.get("DEAL_JOB_CHUNK_SIZE", 10_000))
+# Seconds a finished job and its results stay queryable before they are deleted
+JOB_RETENTION = float(os.environ.get("DEAL_JOB_RETENTION", 7 * 24 * 3600))
+
+QUEUED, RUNNING, COMPLETED, FAILED = "queued", "running", "completed", "failed"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    created REAL NOT NULL,
+    updated REAL NOT NULL,
+    upload_path TEXT NOT NULL,
+    chunk_size INTEGER NOT NULL,
+    config TEXT NOT NULL,
+    industry_multiples TEXT NOT NULL,
+    config_version INTEGER NOT NULL,
+    total_rows INTEGER,
+    processed_rows INTEGER NOT NULL DEFAULT 0,
+    error_rows INTEGER NOT NULL DEFAULT 0,
+    next_chunk INTEGER NOT NULL DEFAULT 0,
+    error TEXT
+);
+CREATE TABLE IF NOT EXISTS job_results (
+    job_id TEXT NOT NULL,
+    line INTEGER NOT NULL,
+    company_name TEXT,
+    metrics TEXT,
+    error TEXT,
+    PRIMARY KEY (job_id, line)
+);
+"""
+
+
+class JobStore:
+    # One SQLite connection per thread; every chunk is committed in a single transaction
+
+    def __init__(self, path=JOBS_DB):
+        self.path = path
+        self._local = threading.local()
+        with self._connect() as connection:
+            connection.executescript(SCHEMA)
+
+    def _connect(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30)
+            connection.row_factory = sqlite3.Row
+            connection.execute("PRAGMA journal_mode=WAL")
+            self._local.connection = connection
+        return connection
+
+    def create(self, job_id, upload_path, chunk_size, snapshot):
+        now = time.time()
+        with self._connect() as connection:
+            connection.execute(
+                "INSERT INTO jobs (id, status, created, updated, upload_path, chunk_size, config, industry_multiples,"
+                " config_version) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    job_id, QUEUED, now, now, upload_path, chunk_size,
+                    json.dumps(dict(snapshot.config)), json.dumps(dict(snapshot.industry_multiples)), snapshot.version,
+                ),
+            )
+
+    def get(self, job_id):
+        row = self._connect().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return dict(row) if row is not None else None
+
+    def update(self, job_id, **values):
+        values["updated"] = time.time()
+        assignments = ", ".join(f"{name} = ?" for name in values)
+        with self._connect() as connection:
+            connection.execute(f"UPDATE jobs SET {assignments} WHERE id = ?", (*values.values(), job_id))
+
+    def commit_chunk(self, job_id, chunk, rows):
+        # rows are (line, company_name, metrics_json, error) tuples
+        errors = sum(1 for row in rows if row[3] is not None)
+        with self._connect() as connection:
+            connection.executemany(
+                "INSERT OR REPLACE INTO job_results (job_id, line, company_name, metrics, error) VALUES (?, ?, ?, ?, ?)",
+                [(job_id, *row) for row in rows],
+            )
+            connection.execute(
+                "UPDATE jobs SET next_chunk = ?, processed_rows = processed_rows + ?, error_rows = error_rows + ?,"
+                " updated = ? WHERE id = ? AND next_chunk = ?",
+                (chunk + 1, len(rows), errors, time.time(), job_id, chunk),
+            )
+
+    def results(self, job_id, offset, limit):
+        rows = self._connect().execute(
+            "SELECT line, company_name, metrics, error FROM job_results WHERE job_id = ? ORDER BY line LIMIT ? OFFSET ?",
+            (job_id, limit, offset),
+        )
+        return [
+            {"company_name": company_name, "metrics": json.loads(metrics)}
+            if error is None
+            else {"line": line, "company_name": company_name, "error": error}
+            for line, company_name, metrics, error in rows
+        ]
+
+    def expire(self, before):
+        # Deletes jobs that finished before the given time, with their results; returns their upload paths
+        with self._connect() as connection:
+            rows = connection.execute(
+                "SELECT id, upload_path FROM jobs WHERE status IN (?, ?) AND updated < ?", (COMPLETED, FAILED, before)
+            ).fetchall()
+            connection.executemany("DELETE FROM job_results WHERE job_id = ?", [(row["id"],) for row in rows])
+            connection.executemany("DELETE FROM jobs WHERE id = ?", [(row["id"],) for row in rows])
+        return [row["upload_path"] for row in rows]
+
+    def unfinished(self):
+        rows = self._connect().execute("SELECT id FROM jobs WHERE status IN (?, ?) ORDER BY created", (QUEUED, RUNNING))
+        return [row["id"] for row in rows]
+
+
+def describe(job):
+    # Public view of a job row, without the stored config
+    total = job["total_rows"]
+    return {
+        "job_id": job["id"],
+        "status": job["status"],
+        "created": job["created"],
+        "updated": job["updated"],
+        "config_version": job["config_version"],
+        "total_rows": total,
+        "processed_rows": job["processed_rows"],
+        "error_rows": job["error_rows"],
+        "progress": job["processed_rows"] / total if total else (1.0 if job["status"] == COMPLETED else 0.0),
+        "error": job["error"],
+    }
+
+
+class JobRunner:
+    # Runs queued jobs on local threads; the CPU-heavy evaluation of each chunk goes to the process pool
+
+    def __init__(self, store, workers=JOB_WORKERS, uploads_dir=JOBS_DIR):
+        self.store = store
+        self.uploads_dir = uploads_dir
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="deal-job")
+        # Set on shutdown; running jobs stop at their next chunk and stay RUNNING for resume to pick up
+        self.stopping = threading.Event()
+        os.makedirs(uploads_dir, exist_ok=True)
+
+    def upload_path(self, job_id):
+        return os.path.join(self.uploads_dir, f"{job_id}.csv")
+
+    def create(self, upload_path, chunk_size=JOB_CHUNK_SIZE, job_id=None):
+        self.prune()
+        job_id = job_id or uuid.uuid4().hex
+        self.store.create(job_id, upload_path, chunk_size, current_snapshot())
+        self.executor.submit(self.run, job_id)
+        return job_id
+
+    def resume(self):
+        # Several server processes share one jobs database; only the one holding the resume lock picks up
+        # unfinished jobs, so no job is run twice
+        if not self._hold_resume_lock():
+            return
+        self.prune()
+        for job_id in self.store.unfinished():
+            self.executor.submit(self.run, job_id)
+
+    def _hold_resume_lock(self):
+        if fcntl is None:
+            return True
+        handle = open(f"{self.store.path}.lock", "w")
+        try:
+            fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            handle.close()
+            return False
+        # Kept open, and so locked, for the life of the process
+        self._resume_lock = handle
+        return True
+
+    def prune(self):
+        for path in self.store.expire(time.time() - JOB_RETENTION):
+            _remove(path)
+
+    def shutdown(self):
+        self.stopping.set()
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    def run(self, job_id):
+        # The upload is read chunk_size records at a time, so memory does not grow with the file; a chunk is one
+        # transaction, and after a restart the committed chunks are read past without being parsed again
+        job = self.store.get(job_id)
+        path = job["upload_path"]
+        if self.stopping.is_set():
+            return
+        try:
+            self.store.update(job_id, status=RUNNING)
+            if job["total_rows"] is None:
+                with stage("job_count"), open(path, newline="", encoding="utf-8") as upload:
+                    reader, _ = open_deal_csv(upload)
+                    self.store.update(job_id, total_rows=sum(1 for row in reader if row))
+
+            config = json.loads(job["config"])
+            multiples = json.loads(job["industry_multiples"])
+            with open(path, newline="", encoding="utf-8") as upload:
+                reader, index = open_deal_csv(upload)
+                for chunk, (rows, line_numbers) in enumerate(iter_row_chunks(reader, job["chunk_size"])):
+                    if chunk < job["next_chunk"]:
+                        continue
+                    # Chunks already committed are kept; the process pool may be gone, so it is not used again
+                    if self.stopping.is_set():
+                        return
+                    count_job_rows(len(rows))
+                    with stage("job_parse"):
+                        parsed = parse_rows(rows, line_numbers, index)
+                    with stage("job_evaluate"):
+                        batch = get_pool().submit(evaluate_batch, parsed.columns, config, multiples).result()
+                    with stage("job_commit"):
+                        self.store.commit_chunk(job_id, chunk, result_rows(parsed, batch))
+
+            self.store.update(job_id, status=COMPLETED)
+        except (Exception, CancelledError) as exc:
+            # A chunk cut off by shutdown tearing down the pool is redone on resume, not a failure
+            if self.stopping.is_set():
+                return
+            self.store.update(job_id, status=FAILED, error=str(exc))
+        # Finished jobs are never resumed, so their upload is no longer needed
+        _remove(path)
+
+
+def result_rows(parsed, batch):
+    # (line, company_name, metrics_json, error) for every row of an evaluated chunk, parse errors included
+    line_numbers = parsed.line_numbers.tolist()
+    company_names = parsed.columns.company_name.tolist()
+    rows = [
+        (line_numbers[i], company_names[i], None, batch.errors[i])
+        if metrics is None
+        else (line_numbers[i], company_names[i], json.dumps(metrics), None)
+        for i, metrics in enumerate(batch.iter_metrics())
+    ]
+    rows.extend((error["line"], error["company_name"], None, error["error"]) for error in parsed.errors)
+    return rows
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+_runner = None
+
+
+def get_job_runner():
+    global _runner
+    if _runner is None:
+        _runner = JobRunner(JobStore())
+    return _runner
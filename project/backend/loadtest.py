@@ -0,0 +1,350 @@
+import argparse
+import asyncio
+import csv
+import io
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+
+import httpx
+import numpy as np
+
+from benchmark import isolate_state
+from synthetic import CSV_FIELDS, generate_deals
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Share of scheduled requests per kind; override with --mix evaluate=80,upload=5,...
+DEFAULT_MIX = {"evaluate": 85, "upload": 5, "config_update": 2, "config_read": 8}
+# Config changes cycled through by config_update; each moves a different assessment
+CONFIG_CHANGES = (
+    {},
+    {"modeled_discount_rate": 0.15, "modeled_cash_months": 18.0},
+    {"modeled_interest_rate": 0.08, "modeled_valuation_threshold": 0.4},
+)
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(workers, state_dir):
+    # Runs serve.py on localhost in a child process and waits until it answers. Its config, deal store and
+    # jobs live in state_dir, so the run neither sees nor changes the state of a real deployment.
+    port = free_port()
+    env = dict(
+        os.environ,
+        DEAL_STORE_DB=os.path.join(state_dir, "deals.sqlite3"),
+        DEAL_JOBS_DB=os.path.join(state_dir, "jobs.sqlite3"),
+        DEAL_JOBS_DIR=os.path.join(state_dir, "job_uploads"),
+    )
+    process = subprocess.Popen(
+        [
+            sys.executable, os.path.join(BACKEND_DIR, "serve.py"), "--host", "127.0.0.1", "--port", str(port),
+            "--workers", str(workers), "--config-db", os.path.join(state_dir, "config.sqlite3"),
+            "--log-level", "warning",
+        ],
+        env=env,
+    )
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"uvicorn exited with status {process.returncode}")
+        try:
+            httpx.get(f"{url}/get-config", timeout=1).raise_for_status()
+            return process, url
+        except httpx.HTTPError:
+            time.sleep(0.1)
+    process.terminate()
+    raise RuntimeError("uvicorn did not start within 30 seconds")
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        if name not in DEFAULT_MIX:
+            raise ValueError(f"Unknown request kind {name!r}, expected one of {', '.join(DEFAULT_MIX)}")
+        mix[name] = float(weight)
+    return mix
+
+
+def csv_payload(deals):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(CSV_FIELDS)
+    for deal in deals:
+        row = dict(deal, yearly_revenue=",".join(map(str, deal["yearly_revenue"])))
+        writer.writerow([row[name] for name in CSV_FIELDS])
+    return buffer.getvalue().encode("utf-8")
+
+
+def expected_metrics(deals, config, multiples):
+    # What the service should answer for every deal under one config, from the same engine it runs
+    from batch import DealColumns, evaluate_batch
+
+    batch = evaluate_batch(DealColumns.from_records(deals), config, multiples)
+    return [None if i in batch.errors else batch.metrics(i) for i in range(len(deals))]
+
+
+class ConfigTimeline:
+    # Which configs may have been live when. Config k may be served from the moment its update is sent until
+    # the update replacing it is acknowledged, plus the staleness the deployment is allowed for propagation.
+
+    def __init__(self, staleness):
+        self.staleness = staleness
+        self.updates = [(0, float("-inf"), float("-inf"))]  # (variant, sent, acknowledged)
+
+    def sent(self, variant, at):
+        self.updates.append((variant, at, None))
+        return len(self.updates) - 1
+
+    def acknowledged(self, index, at):
+        variant, sent, _ = self.updates[index]
+        self.updates[index] = (variant, sent, at)
+
+    def valid(self, started, finished):
+        variants = set()
+        for k, (variant, sent, _) in enumerate(self.updates):
+            replaced = self.updates[k + 1][2] if k + 1 < len(self.updates) else None
+            until = float("inf") if replaced is None else replaced + self.staleness
+            if sent <= finished and until >= started:
+                variants.add(variant)
+        return variants
+
+
+class LoadTest:
+    def __init__(self, client, deals, bulk_payloads, variants, expected, mix, staleness, seed):
+        self.client = client
+        self.deals = deals
+        self.bulk_payloads = bulk_payloads
+        self.variants = variants
+        self.expected = expected
+        self.kinds = list(mix)
+        self.weights = [mix[kind] for kind in self.kinds]
+        self.timeline = ConfigTimeline(staleness)
+        self.rng = random.Random(seed)
+        self.update_lock = asyncio.Lock()
+        self.updates = 0
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.drift = defaultdict(int)
+        self.samples = []
+
+    def check(self, kind, results, started, finished):
+        # results are (deal index, metrics) pairs from one response, which must all come from one config that
+        # was live during the request. Stale means an older or newer config outside that window answered.
+        valid = self.timeline.valid(started, finished)
+        matching = {
+            variant for variant, expected in enumerate(self.expected)
+            if all(expected[index] == metrics for index, metrics in results)
+        }
+        if matching & valid:
+            return
+        self.drift[kind] += 1
+        reason = "stale" if matching else "mismatch"
+        if len(self.samples) < 20:
+            self.samples.append({"kind": kind, "reason": reason, "valid": sorted(valid), "matching": sorted(matching)})
+
+    async def evaluate(self):
+        index = self.rng.randrange(len(self.deals))
+        started = time.monotonic()
+        response = await self.client.post("/evaluate-deal", json=self.deals[index])
+        finished = time.monotonic()
+        response.raise_for_status()
+        self.check("evaluate", [(index, response.json())], started, finished)
+
+    async def upload(self):
+        indices, payload = self.bulk_payloads[self.rng.randrange(len(self.bulk_payloads))]
+        started = time.monotonic()
+        response = await self.client.post("/upload-csv", files={"file": ("deals.csv", payload, "text/csv")})
+        finished = time.monotonic()
+        response.raise_for_status()
+        body = response.json()
+        if body["errors"] or len(body["results"]) != len(indices):
+            raise ValueError(f"upload returned {len(body['results'])} results and {len(body['errors'])} errors")
+        self.check("upload", [(i, result["metrics"]) for i, result in zip(indices, body["results"])], started, finished)
+
+    async def config_update(self):
+        # Updates are serialized so the timeline has a single order of versions
+        async with self.update_lock:
+            self.updates += 1
+            variant = self.updates % len(self.variants)
+            index = self.timeline.sent(variant, time.monotonic())
+            response = await self.client.put("/update-config", json=self.variants[variant])
+            response.raise_for_status()
+            self.timeline.acknowledged(index, time.monotonic())
+
+    async def config_read(self):
+        started = time.monotonic()
+        response = await self.client.get("/get-config")
+        finished = time.monotonic()
+        response.raise_for_status()
+        config = response.json()["config"]
+        valid = self.timeline.valid(started, finished)
+        if not any(config == self.variants[variant] for variant in valid):
+            self.drift["config_read"] += 1
+
+    async def fire(self, kind, scheduled, semaphore):
+        # Latency counts from the scheduled start, so time spent queued behind a slow server is not hidden
+        async with semaphore:
+            try:
+                await getattr(self, kind)()
+            except (httpx.HTTPError, ValueError, KeyError) as exc:
+                self.errors[kind] += 1
+                if len(self.samples) < 20:
+                    self.samples.append({"kind": kind, "error": repr(exc)[:200]})
+        self.latencies[kind].append(time.monotonic() - scheduled)
+
+    async def run(self, rps, duration, concurrency):
+        # Open loop: request i starts at i / rps whatever happened to earlier requests
+        semaphore = asyncio.Semaphore(concurrency)
+        tasks = set()
+        started = time.monotonic()
+        for i in range(int(rps * duration)):
+            scheduled = started + i / rps
+            delay = scheduled - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            kind = self.rng.choices(self.kinds, self.weights)[0]
+            task = asyncio.create_task(self.fire(kind, scheduled, semaphore))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        await asyncio.gather(*tasks)
+        return time.monotonic() - started
+
+
+def summarize(name, latencies, errors, drift, elapsed):
+    latencies = np.asarray(latencies, dtype=np.float64) * 1000
+    count = len(latencies)
+    summary = {
+        "name": name,
+        "requests": count,
+        "errors": errors,
+        "error_rate": round(errors / count, 6) if count else 0.0,
+        "drift": drift,
+        "requests_per_second": round(count / elapsed, 2) if elapsed else None,
+    }
+    if count:
+        for percentile in (50, 90, 99):
+            summary[f"p{percentile}_ms"] = round(float(np.percentile(latencies, percentile)), 3)
+        summary["max_ms"] = round(float(latencies.max()), 3)
+    return summary
+
+
+async def load_test(args, client):
+    baseline = (await client.get("/get-config")).json()["config"]
+    multiples = (await client.get("/get-industry-multiples")).json()["industry_multiples"]
+    variants = [{**baseline, **change} for change in CONFIG_CHANGES]
+    deals = generate_deals(args.deals, args.seed)
+    expected = [expected_metrics(deals, variant, multiples) for variant in variants]
+    rng = random.Random(args.seed)
+    bulk_payloads = []
+    for _ in range(args.bulk_payloads):
+        indices = rng.sample(range(len(deals)), min(args.bulk_size, len(deals)))
+        bulk_payloads.append((indices, csv_payload([deals[i] for i in indices])))
+
+    test = LoadTest(client, deals, bulk_payloads, variants, expected, args.mix, args.staleness, args.seed)
+    try:
+        elapsed = await test.run(args.rps, args.duration, args.concurrency)
+    finally:
+        await client.put("/update-config", json=baseline)
+
+    results = [
+        summarize(kind, test.latencies[kind], test.errors[kind], test.drift[kind], elapsed)
+        for kind in args.mix if test.latencies[kind]
+    ]
+    every = [latency for latencies in test.latencies.values() for latency in latencies]
+    results.append(summarize("total", every, sum(test.errors.values()), sum(test.drift.values()), elapsed))
+    return {
+        "created": datetime.now(timezone.utc).isoformat(),
+        "target_rps": args.rps,
+        "duration": args.duration,
+        "elapsed": round(elapsed, 3),
+        "concurrency": args.concurrency,
+        "bulk_size": args.bulk_size,
+        "config_updates": test.updates,
+        "staleness": args.staleness,
+        "seed": args.seed,
+        "results": results,
+        "samples": test.samples,
+    }
+
+
+async def run_with_client(args, base_url, transport=None):
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=base_url, transport=transport, limits=limits, timeout=args.timeout) as client:
+        return await load_test(args, client)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Drive mixed traffic at a target rate and check results for drift")
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument("--url", help="test a running server instead of starting one")
+    target.add_argument("--in-process", action="store_true", help="call the app in this process, without sockets")
+    parser.add_argument("--server-workers", type=int, default=1, help="worker processes for the local server")
+    parser.add_argument("--rps", type=float, default=200.0, help="target requests per second")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds of traffic")
+    parser.add_argument("--concurrency", type=int, default=64, help="most requests in flight at once")
+    parser.add_argument("--mix", type=parse_mix, default=DEFAULT_MIX, help="weights, e.g. evaluate=85,upload=5")
+    parser.add_argument("--deals", type=int, default=2_000, help="distinct deals the requests draw from")
+    parser.add_argument("--bulk-size", type=int, default=1_000, help="rows per CSV upload")
+    parser.add_argument("--bulk-payloads", type=int, default=4, help="distinct CSV uploads to rotate through")
+    parser.add_argument(
+        "--staleness",
+        type=float,
+        help="seconds an old config may still be served; defaults to two config polls for multi-worker servers",
+    )
+    parser.add_argument("--timeout", type=float, default=60.0, help="per-request timeout in seconds")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    args = parser.parse_args(argv)
+
+    process = None
+    with tempfile.TemporaryDirectory(prefix="deal-loadtest-") as state_dir:
+        # The run publishes config versions and reassesses stored deals, so the backend modules, imported only
+        # from here on, see throwaway state, whether the app runs in this process or in start_server's
+        isolate_state(state_dir)
+        from config_store import CONFIG_POLL_INTERVAL
+
+        if args.staleness is None:
+            single_process = args.in_process or (args.url is None and args.server_workers == 1)
+            args.staleness = 0.0 if single_process else 2 * CONFIG_POLL_INTERVAL
+
+        if args.in_process:
+            from main import app
+
+            report = asyncio.run(run_with_client(args, "http://loadtest", httpx.ASGITransport(app=app)))
+        else:
+            url = args.url
+            if url is None:
+                process, url = start_server(args.server_workers, state_dir)
+            try:
+                report = asyncio.run(run_with_client(args, url))
+            finally:
+                if process is not None:
+                    process.terminate()
+                    process.wait()
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as output:
+            output.write(text + "\n")
+    else:
+        print(text)
+    total = report["results"][-1]
+    return 1 if total["drift"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,65 @@
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Mapping
+
+import numpy as np
+
+from constants import SECURITIES
+
+# Multiple used when an industry is not listed in the industry multiples
+DEFAULT_INDUSTRY_MULTIPLE = 3.0
+
+# Security types interned to small integer codes; anything unlisted maps to OTHER_SECURITY
+SECURITY_CODES = MappingProxyType({name: code for code, name in enumerate(SECURITIES)})
+OTHER_SECURITY = len(SECURITIES)
+DISCOUNT_APPLIES = np.array([name in ("Convertible Note", "SAFE") for name in SECURITIES] + [False])
+INTEREST_APPLIES = np.array([name == "Convertible Note" for name in SECURITIES] + [False])
+
+# Industry code for industries missing from the multiples table
+UNLISTED_INDUSTRY = 0
+
+
+def security_code(security_type):
+    return SECURITY_CODES.get(security_type, OTHER_SECURITY)
+
+
+def encode_securities(security_type):
+    return np.fromiter(
+        (SECURITY_CODES.get(name, OTHER_SECURITY) for name in security_type), dtype=np.int8, count=len(security_type)
+    )
+
+
+# Valuation cutoffs per industry code, precomputed for one config and set of multiples
+@dataclass(frozen=True)
+class LookupTables:
+    industry_codes: Mapping[str, int]
+    high_cutoffs: np.ndarray
+    fair_cutoffs: np.ndarray
+    no_benchmark: np.ndarray
+
+    def industry_code(self, industry):
+        return self.industry_codes.get(industry, UNLISTED_INDUSTRY)
+
+    def encode_industries(self, industry):
+        codes = self.industry_codes
+        return np.fromiter(
+            (codes.get(name, UNLISTED_INDUSTRY) for name in industry), dtype=np.int32, count=len(industry)
+        )
+
+
+def build_tables(config, multiples):
+    # Codes follow the order of the multiples mapping, which only ever grows, so they stay
+    # stable across config versions. A None multiple ("Other") means there is no benchmark.
+    names = list(multiples)
+    values = [DEFAULT_INDUSTRY_MULTIPLE] + [multiples[name] for name in names]
+    no_benchmark = np.array([value is None for value in values], dtype=bool)
+    high_cutoffs = np.array([np.nan if value is None else float(value) for value in values], dtype=np.float64)
+    fair_cutoffs = (1 - config["modeled_valuation_threshold"]) * high_cutoffs
+    for array in (no_benchmark, high_cutoffs, fair_cutoffs):
+        array.flags.writeable = False
+    return LookupTables(
+        industry_codes=MappingProxyType({name: code for code, name in enumerate(names, start=1)}),
+        high_cutoffs=high_cutoffs,
+        fair_cutoffs=fair_cutoffs,
+        no_benchmark=no_benchmark,
+    )
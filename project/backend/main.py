@@ -1,15 +1,53 @@
-from fastapi import FastAPI, File, UploadFile
-from pydantic import BaseModel
-from typing import List, Optional
-from dataclasses import dataclass, field
-from io import StringIO
-import csv
+from fastapi import FastAPI, File, HTTPException, Query, UploadFile
+from pydantic import BaseModel, ValidationError, conlist, root_validator
+from typing import Any, Dict, List, Optional, Union
+import os
+import uuid
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.concurrency import run_in_threadpool
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
+
+from aggregates import PortfolioAggregate
+from batch import DealColumns
+from cache import evaluate_cached, evaluation_cache, record_key
+from config_store import current_snapshot, watch_config
+from csv_parser import CSVFormatError, parse_deal_csv
+from deal_store import SORTABLE, get_deal_store, publish_and_reassess
+from engine import evaluate_record
+from export import EXTENSIONS, FORMATS, MEDIA_TYPES, check_format, default_format, iter_stored_export, stream_export
+from instrumentation import InstrumentedRoute, MetricsMiddleware, count_rows, profiles, render_metrics, stage
+from lookup import build_tables
+from jobs import JOB_CHUNK_SIZE, describe, get_job_runner
+from parallel import evaluate_parallel, shutdown_pool, summarize_parallel
+from serialization import dumps, encode_metrics, encode_named, encode_results, encode_row
+from scenarios import (
+    DEFAULT_BURN_VOLATILITY,
+    MAX_SIMULATION_PATHS,
+    MAX_SIMULATION_YEARS,
+    SIMULATION_PATHS,
+    SIMULATION_YEARS,
+    simulate_parallel,
+)
+from streaming import MAX_STREAM_CHUNK_SIZE, STREAM_CHUNK_SIZE, stream_evaluations
+from sweep import MAX_SWEEP_POINTS, grid_size, sweep
+
+# Largest number of deals accepted by /evaluate-deals in one request
+MAX_BULK_DEALS = int(os.environ.get("DEAL_BULK_MAX", 100_000))
+# What bulk and CSV evaluations return: per-row results, the portfolio summary only, or both
+VIEW = Query("rows", regex="^(rows|summary|both)$")
+
+
+# Same output as JSONResponse, encoded with orjson when it is installed
+class FastJSONResponse(JSONResponse):
+    def render(self, content):
+        return dumps(content)
 
-from constants import DEFAULT_CONFIG, INDUSTRY_MULTIPLES
 
 # Initialize FastAPI app
-app = FastAPI(strict_slashes=False)
+app = FastAPI(strict_slashes=False, default_response_class=FastJSONResponse)
+# Every route times its request validation, endpoint and serialization separately
+app.router.route_class = InstrumentedRoute
 
 # Define Pydantic models for input validation
 class DealData(BaseModel):
@@ -25,6 +63,29 @@ class DealData(BaseModel):
     current_cash: Optional[float] = 0.0
     months_of_cash: Optional[float] = 0.0
     previous_raise: Optional[float] = 0.0
+    # Per-request overrides layered over the current config
+    config: Optional[Dict[str, float]] = None
+
+
+# Column-oriented bulk payload: one list per DealData field, all of the same length
+class DealColumnsData(BaseModel):
+    company_name: List[str]
+    industry: List[str]
+    ask: List[float]
+    valuation_cap: List[float]
+    security_type: List[str]
+    discount_rate: List[float]
+    interest: List[float]
+    yearly_revenue: List[List[float]]
+    monthly_burn: Optional[List[float]] = None
+    current_cash: Optional[List[float]] = None
+
+    @root_validator(skip_on_failure=True)
+    def check_lengths(cls, values):
+        lengths = {name: len(column) for name, column in values.items() if column is not None}
+        if len(set(lengths.values())) > 1:
+            raise ValueError(f"columns must all have the same length, got {lengths}")
+        return values
 
 
 class Config(BaseModel):
@@ -37,157 +98,448 @@ class Config(BaseModel):
     modeled_cash_months: float = 12.00
 
 
-# Define the Deal dataclass
-@dataclass
-class Deal:
-    company_name: str = ""
-    industry: str = ""
-    ask: float = 0.0
-    valuation_cap: float = 0.0
-    security_type: str = ""
-    discount_rate: float = 0.0
-    interest: float = 0.0
-    yearly_revenue: List[float] = field(default_factory=list)
-    monthly_burn: float = 0.0
-    current_cash: float = 0.0
-    previous_raise: float = 0.0
-    months_of_cash: float = 0.0
-    config: dict = field(default_factory=lambda: DEFAULT_CONFIG)
-
-    # Calculated metrics
-    growth_rates: List[float] = field(default_factory=list)
-    growth_rate_assessment: List[str] = field(default_factory=list)
-    implied_multiple: float = None
-    assessment_discount_rate: str = ""
-    assessment_deal_interest: str = ""
-    valuation_assessment: str = ""
-    runway_assessment: str = ""
-
-    def calculate_revenue_growth_rates(self):
-        self.growth_rates = [
-            (self.yearly_revenue[i] - self.yearly_revenue[i - 1]) / self.yearly_revenue[i - 1] * 100
-            for i in range(1, len(self.yearly_revenue))
-        ]
-
-    def assess_growth_rate(self):
-        self.growth_rate_assessment = []
-        for growth_rate in self.growth_rates:
-            if growth_rate >= self.config["modeled_revenue_growth_aggressive"] * 100:
-                self.growth_rate_assessment.append("Aggressive")
-            elif growth_rate >= self.config["modeled_revenue_growth_standard"] * 100:
-                self.growth_rate_assessment.append("Standard")
-            else:
-                self.growth_rate_assessment.append("Low")
-
-    def calculate_metrics(self):
-        self.calculate_revenue_growth_rates()
-        self.assess_growth_rate()
-
-        # Implied Multiple
-        self.implied_multiple = self.valuation_cap / self.yearly_revenue[0] if self.yearly_revenue[0] != 0 else None
-
-        # Discount Rate Assessment
-        if self.security_type in ["Convertible Note", "SAFE"]:
-            if self.discount_rate == 0:
-                self.assessment_discount_rate = "Zero Discount"
-            elif self.discount_rate < self.config["modeled_discount_rate"]:
-                self.assessment_discount_rate = "Lower Discount"
-            elif self.discount_rate == self.config["modeled_discount_rate"]:
-                self.assessment_discount_rate = "Standard Discount"
-            else:
-                self.assessment_discount_rate = "Higher Discount"
-        else:
-            self.assessment_discount_rate = "Does not apply"
-
-        # Interest Rate Assessment
-        if self.security_type == "Convertible Note":
-            if self.interest == 0:
-                self.assessment_deal_interest = "Zero Interest"
-            elif self.interest < self.config["modeled_interest_rate"]:
-                self.assessment_deal_interest = "Lower Interest"
-            elif self.interest == self.config["modeled_interest_rate"]:
-                self.assessment_deal_interest = "Standard Interest"
-            else:
-                self.assessment_deal_interest = "Higher Interest"
-        else:
-            self.assessment_deal_interest = "Does not apply"
-
-        # Valuation Assessment
-        industry_multiple = INDUSTRY_MULTIPLES.get(self.industry, 3.0)  # Default to 3.0 if industry not found
-        if self.implied_multiple is None:
-            self.valuation_assessment = "Incomplete"
-        elif self.implied_multiple > industry_multiple:
-            self.valuation_assessment = "High Valuation"
-        elif self.implied_multiple >= (1 - self.config["modeled_valuation_threshold"]) * industry_multiple:
-            self.valuation_assessment = "Fair Valuation"
-        else:
-            self.valuation_assessment = "Favorable Valuation"
+# Values to try for each swept parameter; every combination is one grid point
+class SweepGrid(BaseModel):
+    modeled_discount_rate: Optional[conlist(float, min_items=1)] = None
+    modeled_interest_rate: Optional[conlist(float, min_items=1)] = None
+    modeled_valuation_threshold: Optional[conlist(float, min_items=1)] = None
+    modeled_cash_months: Optional[conlist(float, min_items=1)] = None
+    # Scales every industry multiple; industry_multiples then sets individual industries outright
+    industry_multiple_scale: Optional[conlist(float, min_items=1)] = None
+    industry_multiples: Optional[Dict[str, conlist(float, min_items=1)]] = None
+
+
+class SweepRequest(BaseModel):
+    deals: Union[List[Dict[str, Any]], DealColumnsData]
+    grid: SweepGrid
 
-        # Runway Assessment
-        if self.monthly_burn == 0:
-            self.runway_assessment = "Unknown"
-        else:
-            self.months_of_cash = self.current_cash / self.monthly_burn
-            if self.months_of_cash > self.config["modeled_cash_months"]:
-                self.runway_assessment = "Adequate"
-            else:
-                self.runway_assessment = "Inadequate"
-
-        return {
-            "growth_rates": self.growth_rates,
-            "implied_multiples": self.implied_multiple,
-            "discount_rate_assessment": self.assessment_discount_rate,
-            "interest_rate_assessment": self.assessment_deal_interest,
-            "valuation_assessment": self.valuation_assessment,
-            "runway_assessment": self.runway_assessment,
-        }
 
 # API Routes
 @app.post("/evaluate-deal")
-def evaluate_deal(data: DealData):
-    deal = Deal(**data.dict())
-    metrics = deal.calculate_metrics()
-    return metrics
+def evaluate_deal(data: DealData, store: bool = False):
+    record = data.dict()
+    overrides = record.pop("config")
+    snapshot = current_snapshot()
+    version = snapshot.version if not overrides else (snapshot.version, tuple(sorted(overrides.items())))
+    with stage("cache_lookup"):
+        key = record_key(record, version)
+        row = evaluation_cache.get(key)
+    if row is None:
+        with stage("calculate_metrics"):
+            config = snapshot.with_overrides(overrides)
+            tables = snapshot.tables if not overrides else build_tables(config, snapshot.industry_multiples)
+            row = evaluate_record(record, config, tables)
+        evaluation_cache.put(key, row)
+
+    # Results under per-request overrides do not belong to any config version, so they are not stored
+    if store and not overrides:
+        with stage("store"):
+            get_deal_store().record_deal(record, row, snapshot.version)
+    # The packed row is written straight to JSON; it encodes to the same object calculate_metrics returns
+    with stage("encode_response"):
+        return Response(encode_row(row), media_type="application/json")
+
+
+def bulk_columns(data):
+    # Validates a bulk payload in one pass; invalid items are reported by index without failing the batch
+    count = len(data) if isinstance(data, list) else len(data.company_name)
+    if count > MAX_BULK_DEALS:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_BULK_DEALS} deals are accepted per request")
+
+    count_rows(count)
+    errors = []
+    with stage("bulk_validation"):
+        if isinstance(data, list):
+            records = []
+            positions = []
+            overridden = []
+            for i, item in enumerate(data):
+                try:
+                    record = DealData.parse_obj(item).dict()
+                except ValidationError as exc:
+                    errors.append({"index": i, "error": exc.errors()})
+                    continue
+                if record.pop("config"):
+                    overridden.append(i)
+                records.append(record)
+                positions.append(i)
+            # A batch is evaluated under one snapshot; per-deal overrides are refused rather than ignored
+            if overridden:
+                detail = f"Per-deal config overrides are only accepted by /evaluate-deal; found on items {overridden}"
+                raise HTTPException(status_code=422, detail=detail)
+            columns = DealColumns.from_records(records)
+        else:
+            positions = range(count)
+            columns = DealColumns.from_columns(**data.dict())
+    return columns, positions, errors, count
 
 
-@app.post("/upload-csv")
-async def upload_csv(file: UploadFile = File(...)):
-    contents = await file.read()
-    csv_file = StringIO(contents.decode("utf-8"))
-    reader = csv.DictReader(csv_file)
+async def summarize(columns, snapshot, invalid, batch=None):
+    # Portfolio summary of the rows; without an evaluated batch the workers evaluate and aggregate each chunk and
+    # send back only their aggregates, so no per-row result is built
+    with stage("aggregate"):
+        if batch is None:
+            aggregate = await summarize_parallel(columns, snapshot.config, snapshot.industry_multiples)
+        else:
+            aggregate = PortfolioAggregate()
+            aggregate.add(columns, batch)
+        aggregate.add_errors(invalid)
+        return aggregate.summary(snapshot)
+
+
+def summary_response(summary):
+    return Response(dumps({"summary": summary}), media_type="application/json")
+
+
+@app.post("/evaluate-deals")
+async def evaluate_deals(data: Union[List[Dict[str, Any]], DealColumnsData], store: bool = False, view: str = VIEW):
+    columns, positions, errors, count = bulk_columns(data)
+    snapshot = current_snapshot()
+    if view == "summary" and not store:
+        return summary_response(await summarize(columns, snapshot, len(errors)))
+    with stage("evaluate"):
+        batch = await evaluate_cached(columns, evaluate_parallel, snapshot)
+    if store:
+        with stage("store"):
+            await run_in_threadpool(get_deal_store().record_batch, columns, batch, snapshot.version)
+    summary = None if view == "rows" else await summarize(columns, snapshot, len(errors), batch)
+    if view == "summary":
+        return summary_response(summary)
+    errors.extend({"index": positions[i], "error": error} for i, error in batch.errors.items())
+
+    with stage("encode_response"):
+        results = [b"null"] * count
+        for i, metrics in zip(positions, encode_metrics(batch)):
+            if metrics is not None:
+                results[i] = metrics
+        body = encode_results(results, jsonable_encoder(sorted(errors, key=lambda error: error["index"])), summary)
+    return Response(body, media_type="application/json")
+
+
+@app.post("/simulate-deals")
+async def simulate_deals(
+    data: Union[List[Dict[str, Any]], DealColumnsData],
+    paths: int = Query(SIMULATION_PATHS, gt=0, le=MAX_SIMULATION_PATHS),
+    years: int = Query(SIMULATION_YEARS, gt=0, le=MAX_SIMULATION_YEARS),
+    seed: int = Query(0, ge=0),
+    burn_volatility: float = Query(DEFAULT_BURN_VOLATILITY, ge=0),
+):
+    # Forward-looking percentiles per deal under randomized growth and burn; the same seed gives the same results
+    columns, positions, errors, count = bulk_columns(data)
+    snapshot = current_snapshot()
+    with stage("simulate"):
+        summaries, failed = await simulate_parallel(columns, seed, snapshot.config, paths, years, burn_volatility)
+    errors.extend({"index": positions[i], "error": error} for i, error in failed.items())
+
+    results = [None] * count
+    for i, summary in zip(positions, summaries):
+        results[i] = summary
+    return {
+        "results": results,
+        "errors": sorted(errors, key=lambda error: error["index"]),
+        "seed": seed,
+        "paths": paths,
+        "years": years,
+        "version": snapshot.version,
+    }
+
+
+@app.post("/sweep")
+async def sweep_thresholds(request: SweepRequest, include_flips: bool = True):
+    # Classification counts and per-deal flips against the current config for every grid point; the deals are
+    # evaluated once and each grid point only re-runs the assessments its parameters feed
+    grid = request.grid.dict(exclude_none=True)
+    if grid_size(grid) > MAX_SWEEP_POINTS:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_SWEEP_POINTS} grid points are accepted per sweep")
+    columns, positions, errors, count = bulk_columns(request.deals)
+    snapshot = current_snapshot()
+    with stage("evaluate"):
+        batch = await evaluate_cached(columns, evaluate_parallel, snapshot)
+    errors.extend({"index": positions[i], "error": error} for i, error in batch.errors.items())
+    with stage("sweep"):
+        result = await run_in_threadpool(sweep, columns, batch, snapshot, grid, positions, include_flips)
+    return {**result, "errors": sorted(errors, key=lambda error: error["index"])}
+
+
+def parse_csv(contents):
+    with stage("csv_decode"):
+        text = contents.decode("utf-8")
+    with stage("csv_parse"):
+        return parse_deal_csv(text)
 
-    results = []
-    for row in reader:
-        row["yearly_revenue"] = list(map(float, row["yearly_revenue"].split(",")))
-        deal = Deal(**row)
-        metrics = deal.calculate_metrics()
-        results.append({"company_name": row["company_name"], "metrics": metrics})
 
-    return {"results": results}
+@app.post("/upload-csv")
+async def upload_csv(file: UploadFile = File(...), store: bool = False, view: str = VIEW):
+    contents = await file.read()
+    try:
+        parsed = await run_in_threadpool(parse_csv, contents)
+    except CSVFormatError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+    # Evaluate off the event loop, in worker processes for large uploads
+    columns = parsed.columns
+    count_rows(len(columns) + len(parsed.errors))
+    snapshot = current_snapshot()
+    if view == "summary" and not store:
+        return summary_response(await summarize(columns, snapshot, len(parsed.errors)))
+    with stage("evaluate"):
+        batch = await evaluate_cached(columns, evaluate_parallel, snapshot)
+    if store:
+        with stage("store"):
+            await run_in_threadpool(get_deal_store().record_batch, columns, batch, snapshot.version)
+    summary = None if view == "rows" else await summarize(columns, snapshot, len(parsed.errors), batch)
+    if view == "summary":
+        return summary_response(summary)
+    company_names = columns.company_name.tolist()
+    line_numbers = parsed.line_numbers.tolist()
+
+    # Rows that fail to parse or evaluate are reported by line number instead of failing the upload
+    errors = parsed.errors + [
+        {"line": line_numbers[i], "company_name": company_names[i], "error": error}
+        for i, error in batch.errors.items()
+    ]
+    with stage("encode_response"):
+        results = [result for result in encode_named(company_names, encode_metrics(batch)) if result is not None]
+        body = encode_results(results, sorted(errors, key=lambda error: error["line"]), summary)
+    return Response(body, media_type="application/json")
+
+
+@app.post("/upload-csv/stream")
+async def upload_csv_stream(
+    file: UploadFile = File(...),
+    chunk_size: int = Query(STREAM_CHUNK_SIZE, gt=0, le=MAX_STREAM_CHUNK_SIZE),
+    view: str = VIEW,
+):
+    # Decodes and evaluates the upload chunk by chunk, returning one JSON object per line; with a summary view the
+    # portfolio summary is aggregated chunk by chunk and sent as the last line
+    return StreamingResponse(stream_evaluations(file, chunk_size, view), media_type="application/x-ndjson")
+
+
+@app.get("/deals")
+def query_deals(
+    industry: Optional[str] = None,
+    security_type: Optional[str] = None,
+    discount_rate_assessment: Optional[str] = None,
+    interest_rate_assessment: Optional[str] = None,
+    valuation_assessment: Optional[str] = None,
+    runway_assessment: Optional[str] = None,
+    config_version: Optional[int] = None,
+    sort: str = Query("company_name", enum=list(SORTABLE)),
+    descending: bool = False,
+    offset: int = Query(0, ge=0),
+    limit: int = Query(100, gt=0, le=10_000),
+):
+    # Filters, sorting and pagination all run in SQLite against the indexed deal store
+    filters = {
+        "industry": industry,
+        "security_type": security_type,
+        "discount_rate_assessment": discount_rate_assessment,
+        "interest_rate_assessment": interest_rate_assessment,
+        "valuation_assessment": valuation_assessment,
+        "runway_assessment": runway_assessment,
+        "config_version": config_version,
+    }
+    try:
+        total, deals = get_deal_store().query(filters, sort, descending, offset, limit)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    return {"total": total, "offset": offset, "limit": limit, "results": deals}
+
+
+def export_response(chunks, export_format, name):
+    return StreamingResponse(
+        chunks,
+        media_type=MEDIA_TYPES[export_format],
+        headers={"Content-Disposition": f'attachment; filename="{name}{EXTENSIONS[export_format]}"'},
+    )
+
+
+def export_format_or_400(export_format):
+    export_format = export_format or default_format()
+    try:
+        check_format(export_format)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    return export_format
+
+
+@app.post("/export/upload-csv")
+async def export_upload_csv(
+    file: UploadFile = File(...),
+    format: Optional[str] = Query(None, enum=list(FORMATS)),
+    chunk_size: int = Query(STREAM_CHUNK_SIZE, gt=0, le=MAX_STREAM_CHUNK_SIZE),
+):
+    # Evaluates the upload like /upload-csv/stream but returns one Parquet, Arrow or CSV file, a row group per chunk
+    export_format = export_format_or_400(format)
+    chunks = stream_export(file, export_format, chunk_size)
+    # The header is checked before the response starts so a bad file still gets a 400
+    try:
+        first = await chunks.__anext__()
+    except CSVFormatError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+    async def body():
+        yield first
+        async for chunk in chunks:
+            yield chunk
+
+    return export_response(body(), export_format, "evaluations")
+
+
+@app.get("/export/deals")
+def export_deals(
+    industry: Optional[str] = None,
+    security_type: Optional[str] = None,
+    discount_rate_assessment: Optional[str] = None,
+    interest_rate_assessment: Optional[str] = None,
+    valuation_assessment: Optional[str] = None,
+    runway_assessment: Optional[str] = None,
+    config_version: Optional[int] = None,
+    format: Optional[str] = Query(None, enum=list(FORMATS)),
+    page_size: int = Query(10_000, gt=0, le=100_000),
+):
+    # The deal store with the same filters as /deals, streamed page by page without re-evaluating anything
+    export_format = export_format_or_400(format)
+    filters = {
+        "industry": industry,
+        "security_type": security_type,
+        "discount_rate_assessment": discount_rate_assessment,
+        "interest_rate_assessment": interest_rate_assessment,
+        "valuation_assessment": valuation_assessment,
+        "runway_assessment": runway_assessment,
+        "config_version": config_version,
+    }
+    store = get_deal_store()
+    try:
+        store.filter_clauses(filters)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    return export_response(iter_stored_export(store, export_format, filters, page_size), export_format, "deals")
+
+
+@app.post("/jobs/upload-csv", status_code=202)
+async def create_upload_job(file: UploadFile = File(...), chunk_size: int = Query(JOB_CHUNK_SIZE, gt=0)):
+    # Saves the upload and returns at once; a background worker evaluates it chunk by chunk
+    runner = get_job_runner()
+    job_id = uuid.uuid4().hex
+    path = runner.upload_path(job_id)
+    with open(path, "wb") as upload:
+        while True:
+            chunk = await file.read(STREAM_CHUNK_SIZE)
+            if not chunk:
+                break
+            upload.write(chunk)
+    runner.create(path, chunk_size, job_id)
+    return {"job_id": job_id, "status": "queued"}
+
+
+@app.get("/jobs/{job_id}")
+def get_job(job_id: str):
+    job = get_job_runner().store.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return describe(job)
+
+
+@app.get("/jobs/{job_id}/results")
+def get_job_results(job_id: str, offset: int = Query(0, ge=0), limit: int = Query(1000, gt=0, le=10_000)):
+    # Committed rows are available while the job is still running
+    store = get_job_runner().store
+    job = store.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return {**describe(job), "offset": offset, "limit": limit, "results": store.results(job_id, offset, limit)}
 
 
 @app.put("/update-config")
 def update_config(config: Config):
-    global DEFAULT_CONFIG
-    DEFAULT_CONFIG.update(config.dict())
-    return {"message": "Configuration updated successfully", "config": DEFAULT_CONFIG}
+    # Stored deals are brought up to the new version; only the assessments that depend on changed keys are redone
+    snapshot, reevaluation = publish_and_reassess(config=config.dict())
+    return {
+        "message": "Configuration updated successfully",
+        "config": dict(snapshot.config),
+        "version": snapshot.version,
+        "reevaluation": reevaluation,
+    }
 
 
 @app.put("/update-industry-multiples")
-def update_industry_multiples(multiples: dict):
-    global INDUSTRY_MULTIPLES
-    INDUSTRY_MULTIPLES.update(multiples)
-    return {"message": "Industry multiples updated successfully", "industry_multiples": INDUSTRY_MULTIPLES}
+def update_industry_multiples(multiples: Dict[str, Optional[float]]):
+    # Values are numbers, or null for an industry without a benchmark (like "Other")
+    snapshot, reevaluation = publish_and_reassess(industry_multiples=multiples)
+    return {
+        "message": "Industry multiples updated successfully",
+        "industry_multiples": dict(snapshot.industry_multiples),
+        "version": snapshot.version,
+        "reevaluation": reevaluation,
+    }
 
 
 @app.get("/get-industry-multiples")
 def get_industry_multiples():
-    return {"industry_multiples": INDUSTRY_MULTIPLES}
+    snapshot = current_snapshot()
+    return {"industry_multiples": dict(snapshot.industry_multiples), "version": snapshot.version}
 
 
 @app.get("/get-config")
 def get_config():
-    return {"config": DEFAULT_CONFIG}
+    snapshot = current_snapshot()
+    return {"config": dict(snapshot.config), "version": snapshot.version}
+
+
+@app.get("/cache-stats")
+def get_cache_stats():
+    return {"cache": evaluation_cache.stats()}
+
+
+@app.get("/metrics")
+def get_metrics():
+    # Prometheus text exposition of request latencies, stage timers and rows per second
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+
+@app.put("/profiler")
+def configure_profiler(enabled: bool, interval_ms: Optional[float] = Query(None, gt=0)):
+    # While enabled, any request sent with "X-Profile: 1" is sampled and answers with an X-Profile-Id header
+    profiles.configure(enabled, None if interval_ms is None else interval_ms / 1000)
+    return profiles.status()
+
+
+@app.get("/profiler")
+def get_profiler():
+    return profiles.status()
+
+
+@app.get("/profiler/{profile_id}")
+def get_profile(profile_id: str):
+    # Folded stacks, one "outer;...;inner count" line per sampled stack
+    profile = profiles.get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return PlainTextResponse(profile[1])
+
+
+@app.on_event("startup")
+def resume_jobs():
+    get_job_runner().resume()
+
+
+# Keeps this worker in step with versions other workers publish to the shared config file
+config_watcher = None
+
+
+@app.on_event("startup")
+def start_config_watcher():
+    global config_watcher
+    config_watcher = watch_config()
+
+
+@app.on_event("shutdown")
+def shutdown_workers():
+    get_job_runner().shutdown()
+    shutdown_pool()
+    if config_watcher is not None:
+        config_watcher.stop()
 
 
 # Middleware for CORS handling
@@ -197,8 +549,11 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing", "X-Profile-Id"],
 )
+app.add_middleware(MetricsMiddleware)
 
+# Single-process development server; serve.py runs the multi-worker production mode
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
\ No newline at end of file
@@ -0,0 +1,79 @@
+import asyncio
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from aggregates import PortfolioAggregate
+from batch import BatchResult, evaluate_batch
+from config_store import current_snapshot
+
+# Worker processes and rows per chunk for large evaluations; override through the environment
+EVAL_WORKERS = int(os.environ.get("DEAL_EVAL_WORKERS", os.cpu_count() or 1))
+EVAL_CHUNK_SIZE = int(os.environ.get("DEAL_EVAL_CHUNK_SIZE", 50_000))
+
+_pool = None
+
+
+def get_pool(workers=None):
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=workers or EVAL_WORKERS)
+    return _pool
+
+
+def shutdown_pool():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(cancel_futures=True)
+        _pool = None
+
+
+def submit_chunks(executor, columns, chunk_size, config, multiples, function=evaluate_batch):
+    # One future per chunk, in row order; workers send back compact BatchResult arrays
+    return [
+        executor.submit(function, columns.slice(start, start + chunk_size), config, multiples)
+        for start in range(0, len(columns), chunk_size)
+    ]
+
+
+async def evaluate_parallel(columns, config=None, multiples=None, workers=None, chunk_size=None):
+    # Every chunk sees the same snapshot of the config and industry multiples
+    snapshot = current_snapshot()
+    config = dict(snapshot.config if config is None else config)
+    multiples = dict(snapshot.industry_multiples if multiples is None else multiples)
+    workers = workers or EVAL_WORKERS
+    chunk_size = chunk_size or EVAL_CHUNK_SIZE
+
+    # Small uploads are not worth the pickling; keep them on a thread so the event loop stays free
+    if workers <= 1 or len(columns) <= chunk_size:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, evaluate_batch, columns, config, multiples)
+
+    futures = submit_chunks(get_pool(workers), columns, chunk_size, config, multiples)
+    chunks = await asyncio.gather(*(asyncio.wrap_future(future) for future in futures))
+    return BatchResult.concat(chunks)
+
+
+def summarize_batch(columns, config=None, multiples=None):
+    # Evaluates and rolls up one chunk; only the aggregate leaves the worker, never the per-row results
+    aggregate = PortfolioAggregate()
+    aggregate.add(columns, evaluate_batch(columns, config, multiples))
+    return aggregate
+
+
+async def summarize_parallel(columns, config=None, multiples=None, workers=None, chunk_size=None):
+    # PortfolioAggregate for the rows, chunked over the worker pool like evaluate_parallel
+    snapshot = current_snapshot()
+    config = dict(snapshot.config if config is None else config)
+    multiples = dict(snapshot.industry_multiples if multiples is None else multiples)
+    workers = workers or EVAL_WORKERS
+    chunk_size = chunk_size or EVAL_CHUNK_SIZE
+
+    if workers <= 1 or len(columns) <= chunk_size:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, summarize_batch, columns, config, multiples)
+
+    futures = submit_chunks(get_pool(workers), columns, chunk_size, config, multiples, summarize_batch)
+    aggregate = PortfolioAggregate()
+    for chunk in await asyncio.gather(*(asyncio.wrap_future(future) for future in futures)):
+        aggregate.merge(chunk)
+    return aggregate
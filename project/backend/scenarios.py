@@ -0,0 +1,173 @@
+import asyncio
+import os
+
+import numpy as np
+
+from batch import GROWTH_LABELS, evaluate_batch
+from config_store import current_snapshot
+from parallel import EVAL_WORKERS, get_pool
+
+# Simulated paths per deal and years projected past the last reported revenue; override through the environment
+SIMULATION_PATHS = int(os.environ.get("DEAL_SIMULATION_PATHS", 10_000))
+SIMULATION_YEARS = int(os.environ.get("DEAL_SIMULATION_YEARS", 5))
+MAX_SIMULATION_PATHS = 100_000
+MAX_SIMULATION_YEARS = 30
+# Deals per worker task when a portfolio is simulated in the process pool
+SIMULATION_CHUNK_SIZE = int(os.environ.get("DEAL_SIMULATION_CHUNK_SIZE", 250))
+
+PERCENTILES = (5, 25, 50, 75, 95)
+PERCENTILE_NAMES = tuple(f"p{percentile}" for percentile in PERCENTILES)
+# Spread of log yearly growth when a deal has fewer than two growth rates to estimate it from
+DEFAULT_GROWTH_VOLATILITY = 0.35
+MAX_GROWTH_VOLATILITY = 1.5
+# Spread of log monthly burn around the reported burn
+DEFAULT_BURN_VOLATILITY = 0.25
+
+
+def scenario_rates(config):
+    # Yearly growth of each scenario, indexed like GROWTH_LABELS
+    return np.array(
+        [
+            config["modeled_revenue_growth_aggressive"],
+            config["modeled_revenue_growth_standard"],
+            config["modeled_revenue_growth_low"],
+        ]
+    )
+
+
+def scenario_weights(growth_codes):
+    # Historical years classified into each growth scenario, with one pseudo-count so no scenario is impossible
+    counts = np.bincount(growth_codes, minlength=len(GROWTH_LABELS)) + 1.0
+    return counts / counts.sum()
+
+
+def growth_volatility(growth_rates):
+    log_growth = np.log1p(growth_rates[growth_rates > -100] / 100)
+    if len(log_growth) < 2:
+        return DEFAULT_GROWTH_VOLATILITY
+    return min(float(np.std(log_growth, ddof=1)), MAX_GROWTH_VOLATILITY)
+
+
+def percentiles(values):
+    # Same linear interpolation as np.percentile along the last axis; one sort is much cheaper than its
+    # multi-way partition for a handful of percentiles
+    ordered = np.sort(values, axis=-1)
+    positions = np.array(PERCENTILES) / 100 * (ordered.shape[-1] - 1)
+    lower = positions.astype(np.intp)
+    upper = np.minimum(lower + 1, ordered.shape[-1] - 1)
+    fraction = positions - lower
+    return ordered[..., lower] * (1 - fraction) + ordered[..., upper] * fraction
+
+
+def _summary(values):
+    # Percentiles over the paths where the value is defined
+    values = values[np.isfinite(values)]
+    if not len(values):
+        return None
+    return dict(zip(PERCENTILE_NAMES, percentiles(values).tolist()))
+
+
+def simulate_deal(
+    rng, last_revenue, valuation_cap, growth_rates, growth_codes, monthly_burn, current_cash, config,
+    paths=SIMULATION_PATHS, years=SIMULATION_YEARS, burn_volatility=DEFAULT_BURN_VOLATILITY,
+):
+    # Each year of each path draws a growth scenario, weighted by the deal's own history, and a lognormal shock
+    # around that scenario's rate; the burn is drawn once per path around the reported monthly burn
+    weights = np.cumsum(scenario_weights(growth_codes))
+    sigma = growth_volatility(growth_rates)
+    # Draws are single precision; that is ample for log growth and roughly halves the sampling cost
+    draws = rng.random((years, paths), dtype=np.float32)
+    scenarios = (draws >= weights[0]).astype(np.intp) + (draws >= weights[1])
+    log_growth = np.log1p(scenario_rates(config)).astype(np.float32)[scenarios]
+    log_growth += sigma * rng.standard_normal((years, paths), dtype=np.float32) - np.float32(sigma * sigma / 2)
+    np.cumsum(log_growth, axis=0, out=log_growth)
+
+    # Percentiles are taken in log space, so the exit multiple follows from the exit revenue without another pass
+    log_percentiles = percentiles(log_growth).astype(np.float64)
+    if last_revenue > 0:
+        projected = last_revenue * np.exp(log_percentiles)
+        exit_multiple = valuation_cap / projected[-1][::-1]
+        exit_multiple = dict(zip(PERCENTILE_NAMES, exit_multiple.tolist()))
+    else:
+        projected = np.zeros_like(log_percentiles)
+        exit_multiple = None
+
+    summary = {
+        "scenario_weights": dict(zip(GROWTH_LABELS, np.diff(weights, prepend=0.0).tolist())),
+        "growth_volatility": sigma,
+        "projected_revenue": [dict(zip(PERCENTILE_NAMES, year)) for year in projected.tolist()],
+        "exit_implied_multiple": exit_multiple,
+        "months_of_cash": None,
+        "runway_exhaustion_probability": None,
+        "inadequate_runway_probability": None,
+    }
+    # Like the runway assessment, a deal without a burn has no runway to simulate
+    if monthly_burn:
+        burn = monthly_burn * np.exp(burn_volatility * rng.standard_normal(paths) - burn_volatility ** 2 / 2)
+        months = current_cash / burn
+        summary["months_of_cash"] = _summary(months)
+        summary["runway_exhaustion_probability"] = float(np.mean(months < years * 12))
+        summary["inadequate_runway_probability"] = float(np.mean(months <= config["modeled_cash_months"]))
+    return summary
+
+
+def simulate_batch(columns, seeds, config=None, paths=SIMULATION_PATHS, years=SIMULATION_YEARS,
+                   burn_volatility=DEFAULT_BURN_VOLATILITY):
+    # seeds holds one np.random.SeedSequence per row, so a deal's paths do not depend on how rows are chunked;
+    # rows that fail to evaluate come back as None with the error in the second value
+    config = dict(current_snapshot().config if config is None else config)
+    batch = evaluate_batch(columns, config)
+    offsets = columns.revenue_offsets
+    results = []
+    for i in range(len(columns)):
+        if i in batch.errors:
+            results.append(None)
+            continue
+        start, stop = batch.growth_offsets[i], batch.growth_offsets[i + 1]
+        results.append(
+            simulate_deal(
+                np.random.default_rng(seeds[i]),
+                float(columns.revenue[offsets[i + 1] - 1]),
+                float(columns.valuation_cap[i]),
+                batch.growth_rates[start:stop],
+                batch.growth_codes[start:stop],
+                float(columns.monthly_burn[i]),
+                float(columns.current_cash[i]),
+                config,
+                paths,
+                years,
+                burn_volatility,
+            )
+        )
+    return results, batch.errors
+
+
+async def simulate_parallel(columns, seed=0, config=None, paths=SIMULATION_PATHS, years=SIMULATION_YEARS,
+                            burn_volatility=DEFAULT_BURN_VOLATILITY, workers=None, chunk_size=None):
+    # Deterministic under seed: row i always gets the i-th child of the seed, whichever worker runs it
+    config = dict(current_snapshot().config if config is None else config)
+    seeds = np.random.SeedSequence(seed).spawn(len(columns))
+    workers = workers or EVAL_WORKERS
+    chunk_size = chunk_size or SIMULATION_CHUNK_SIZE
+    loop = asyncio.get_running_loop()
+    if workers <= 1 or len(columns) <= chunk_size:
+        return await loop.run_in_executor(
+            None, simulate_batch, columns, seeds, config, paths, years, burn_volatility
+        )
+
+    pool = get_pool(workers)
+    futures = [
+        pool.submit(
+            simulate_batch, columns.slice(start, start + chunk_size), seeds[start:start + chunk_size], config, paths,
+            years, burn_volatility,
+        )
+        for start in range(0, len(columns), chunk_size)
+    ]
+    results = []
+    errors = {}
+    for start, (chunk, chunk_errors) in zip(
+        range(0, len(columns), chunk_size), await asyncio.gather(*(asyncio.wrap_future(future) for future in futures))
+    ):
+        results.extend(chunk)
+        errors.update((start + i, error) for i, error in chunk_errors.items())
+    return results, errors
@@ -0,0 +1,100 @@
+import json
+
+import numpy as np
+
+from batch import DISCOUNT_LABELS, INTEREST_LABELS, RUNWAY_LABELS, VALUATION_LABELS
+
+# orjson is optional; without it the stdlib encoder is used with the same settings as Starlette's JSONResponse
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def dumps(content):
+    # Compact UTF-8 JSON bytes
+    if orjson is not None:
+        return orjson.dumps(content)
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+# Closing part of every metrics object, prebuilt for each combination of assessment codes
+_TAILS = tuple(
+    b',"discount_rate_assessment":%s,"interest_rate_assessment":%s,"valuation_assessment":%s,"runway_assessment":%s}'
+    % (dumps(discount), dumps(interest), dumps(valuation), dumps(runway))
+    for discount in DISCOUNT_LABELS
+    for interest in INTEREST_LABELS
+    for valuation in VALUATION_LABELS
+    for runway in RUNWAY_LABELS
+)
+
+
+def _tail(discount, interest, valuation, runway):
+    # Works on scalars and on whole code arrays alike
+    return ((discount * len(INTEREST_LABELS) + interest) * len(VALUATION_LABELS) + valuation) * len(RUNWAY_LABELS) + runway
+
+
+def number_tokens(values):
+    # JSON text of each number (None becomes null); numbers never contain a comma, so one dumps call and a split
+    if not values:
+        return []
+    return dumps(values)[1:-1].split(b",")
+
+
+def string_tokens(values):
+    # Escaped JSON text of each string without its quotes. Each distinct string is encoded on its own: a joined
+    # array cannot be split back, since a string like 'a",' escapes to text that contains '","'
+    tokens = {}
+    return [tokens[value] if value in tokens else tokens.setdefault(value, dumps(value)[1:-1]) for value in values]
+
+
+def _finite_list(values):
+    # NaN and infinities become None; orjson writes null for them anyway and the stdlib encoder refuses them
+    result = values.tolist()
+    for i in np.flatnonzero(~np.isfinite(values)).tolist():
+        result[i] = None
+    return result
+
+
+def encode_metrics(batch):
+    # The JSON object Deal.calculate_metrics would serialize to, for each row of a BatchResult, or None for
+    # rows in batch.errors. Each column is encoded in one call and the assessments come from _TAILS.
+    # Growth rates of rows with a zero-revenue year are not finite, but those rows are never written out
+    growth_rates = number_tokens(_finite_list(batch.growth_rates))
+    offsets = batch.growth_offsets.tolist()
+    implied = number_tokens(_finite_list(batch.implied_multiple))
+    tails = _tail(
+        batch.discount_codes.astype(np.intp), batch.interest_codes, batch.valuation_codes, batch.runway_codes
+    ).tolist()
+    errors = batch.errors
+    return [
+        None
+        if i in errors
+        else b'{"growth_rates":[%s],"implied_multiples":%s%s'
+        % (b",".join(growth_rates[offsets[i]:offsets[i + 1]]), implied[i], _TAILS[tail])
+        for i, tail in enumerate(tails)
+    ]
+
+
+def encode_row(row):
+    # Same object for a single batch.MetricsRow
+    implied = b"null" if row.implied_multiple != row.implied_multiple else dumps(row.implied_multiple)
+    return b'{"growth_rates":%s,"implied_multiples":%s%s' % (
+        dumps(list(row.growth_rates)), implied, _TAILS[_tail(row.discount, row.interest, row.valuation, row.runway)],
+    )
+
+
+def encode_named(company_names, encoded):
+    # {"company_name": ..., "metrics": ...} for each row, or None where encoded is None
+    return [
+        None if metrics is None else b'{"company_name":"%s","metrics":%s}' % (name, metrics)
+        for name, metrics in zip(string_tokens(company_names), encoded)
+    ]
+
+
+def encode_results(results, errors, summary=None):
+    # {"results": [...], "errors": [...]} from already encoded results, with the portfolio summary when given
+    body = b'{"results":[%s],"errors":%s' % (b",".join(results), dumps(errors))
+    if summary is not None:
+        body += b',"summary":' + dumps(summary)
+    return body + b"}"
@@ -0,0 +1,44 @@
+import argparse
+import os
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def main(argv=None):
+    # Production mode: several uvicorn worker processes that share one config file. `python main.py` stays the
+    # single-process development server with auto-reload.
+    parser = argparse.ArgumentParser(description="Serve the deal assessment API with several worker processes")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="uvicorn worker processes")
+    parser.add_argument(
+        "--config-db",
+        default=os.environ.get("DEAL_CONFIG_DB", "config.sqlite3"),
+        help="SQLite file the workers share the config and industry multiples through",
+    )
+    parser.add_argument(
+        "--poll-interval",
+        type=float,
+        default=float(os.environ.get("DEAL_CONFIG_POLL_INTERVAL", 0.25)),
+        help="most seconds before a config change reaches every worker",
+    )
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args(argv)
+    if args.workers < 1:
+        parser.error("--workers must be at least 1")
+
+    # Workers read their settings from the environment when they import the app
+    os.environ["DEAL_CONFIG_DB"] = os.path.abspath(args.config_db)
+    os.environ["DEAL_CONFIG_POLL_INTERVAL"] = str(args.poll_interval)
+    # Every worker has its own evaluation process pool; split the cores between them unless told otherwise
+    os.environ.setdefault("DEAL_EVAL_WORKERS", str(max(1, (os.cpu_count() or 1) // args.workers)))
+
+    import uvicorn
+
+    uvicorn.run(
+        "main:app", host=args.host, port=args.port, workers=args.workers, app_dir=BACKEND_DIR, log_level=args.log_level
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+import asyncio
+import codecs
+import csv
+import io
+import json
+import os
+
+from aggregates import PortfolioAggregate
+from batch import evaluate_batch
+from config_store import current_snapshot
+from csv_parser import CSVFormatError, parse_records, parse_rows, read_rows, resolve_header
+from serialization import dumps, encode_metrics, encode_named
+
+# Bytes read from the upload per step; each step's complete rows are evaluated as one batch
+STREAM_CHUNK_SIZE = 64 * 1024
+# Largest chunk a client may ask for; the stream holds about one chunk's rows in memory at a time
+MAX_STREAM_CHUNK_SIZE = int(os.environ.get("DEAL_STREAM_MAX_CHUNK_SIZE", 16 * 1024 * 1024))
+
+
+async def iter_upload_chunks(file, chunk_size=STREAM_CHUNK_SIZE):
+    while True:
+        chunk = await file.read(chunk_size)
+        if not chunk:
+            break
+        yield chunk
+
+
+def _split_complete(text):
+    # Only hand complete records to the csv module; a record is incomplete when it has
+    # no trailing newline yet or when a quoted field is still open
+    cut = text.rfind("\n") + 1
+    if cut == 0 or text.count('"', 0, cut) % 2:
+        return "", text
+    return text[:cut], text[cut:]
+
+
+class CSVBatcher:
+    # Turns byte chunks of a CSV file into a ParsedCSV per chunk of complete records, with line numbers counted
+    # across the whole file
+
+    def __init__(self):
+        self._decoder = codecs.getincrementaldecoder("utf-8")()
+        self._index = None
+        self._lines_read = 0
+        self._pending = ""
+
+    def feed(self, chunk, final=False):
+        # Returns None when the chunk completed no records
+        text = self._pending + self._decoder.decode(chunk, final=final)
+        if final:
+            complete, self._pending = text, ""
+        else:
+            complete, self._pending = _split_complete(text)
+        if not complete:
+            return None
+        reader = csv.reader(io.StringIO(complete, newline=""))
+        if self._index is None:
+            header = next(reader, None)
+            if header is None:
+                return None
+            self._index = resolve_header(header)
+        rows, line_numbers = read_rows(reader)
+        parsed = parse_rows(rows, [self._lines_read + line for line in line_numbers], self._index) if rows else None
+        self._lines_read += reader.line_num
+        return parsed
+
+
+async def iter_csv_batches(chunks):
+    batcher = CSVBatcher()
+    async for chunk in chunks:
+        parsed = batcher.feed(chunk)
+        if parsed is not None:
+            yield parsed
+    parsed = batcher.feed(b"", final=True)
+    if parsed is not None:
+        yield parsed
+
+
+def iter_csv_file(file, chunk_size=STREAM_CHUNK_SIZE):
+    # Same batches from a binary file object, for offline use
+    batcher = CSVBatcher()
+    for chunk in iter(lambda: file.read(chunk_size), b""):
+        parsed = batcher.feed(chunk)
+        if parsed is not None:
+            yield parsed
+    parsed = batcher.feed(b"", final=True)
+    if parsed is not None:
+        yield parsed
+
+
+def iter_jsonl_file(file, chunk_size=STREAM_CHUNK_SIZE):
+    # JSON-lines counterpart of iter_csv_file: one deal object per line, about chunk_size bytes per batch
+    line = 0
+    while True:
+        texts = file.readlines(chunk_size)
+        if not texts:
+            break
+        records = []
+        line_numbers = []
+        errors = []
+        for text in texts:
+            line += 1
+            if not text.strip():
+                continue
+            try:
+                record = json.loads(text)
+            except ValueError as exc:
+                errors.append({"line": line, "company_name": None, "error": f"invalid JSON: {exc}"})
+                continue
+            if not isinstance(record, dict):
+                errors.append({"line": line, "company_name": None, "error": "expected a JSON object"})
+                continue
+            records.append(record)
+            line_numbers.append(line)
+        yield parse_records(records, line_numbers, errors)
+
+
+def encode_lines(parsed, batch):
+    # (line number, JSON object) for every row of an evaluated chunk, results and errors alike, in file order
+    company_names = parsed.columns.company_name.tolist()
+    line_numbers = parsed.line_numbers.tolist()
+    lines = [(error["line"], dumps(error)) for error in parsed.errors]
+    for i, line in enumerate(encode_named(company_names, encode_metrics(batch))):
+        if line is None:
+            line = dumps({"line": line_numbers[i], "company_name": company_names[i], "error": batch.errors[i]})
+        lines.append((line_numbers[i], line))
+    lines.sort(key=lambda line: line[0])
+    return lines
+
+
+async def evaluate_snapshot(columns, snapshot):
+    # One chunk on a thread, so a large chunk does not hold up the event loop
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        None, evaluate_batch, columns, snapshot.config, snapshot.industry_multiples, snapshot.tables
+    )
+
+
+async def stream_evaluations(file, chunk_size=STREAM_CHUNK_SIZE, view="rows"):
+    # Yields one NDJSON line per CSV row, in file order, all evaluated against one config snapshot, then a
+    # {"summary": ...} line unless view is "rows"; the summary view sends only that line
+    # instrumentation imports FastAPI, and the CLI imports this module without it
+    from instrumentation import count_rows
+
+    snapshot = current_snapshot()
+    aggregate = None if view == "rows" else PortfolioAggregate()
+    try:
+        async for parsed in iter_csv_batches(iter_upload_chunks(file, chunk_size)):
+            count_rows(len(parsed.columns) + len(parsed.errors))
+            batch = await evaluate_snapshot(parsed.columns, snapshot)
+            if aggregate is not None:
+                aggregate.add(parsed.columns, batch)
+                aggregate.add_errors(len(parsed.errors))
+            if view != "summary":
+                yield b"".join(line + b"\n" for _, line in encode_lines(parsed, batch))
+    except CSVFormatError as exc:
+        # Headers are already sent, so a bad header is reported as the only line of the stream
+        yield dumps({"error": str(exc)}) + b"\n"
+        return
+    if aggregate is not None:
+        yield dumps({"summary": aggregate.summary(snapshot)}) + b"\n"
@@ -0,0 +1,153 @@
+import os
+from itertools import product
+
+import numpy as np
+
+from batch import (
+    ASSESSMENT_LABELS,
+    DEPENDENCIES,
+    assess_discount,
+    assess_interest,
+    assess_runway,
+    assess_valuation,
+)
+from lookup import build_tables, encode_securities
+
+# Largest number of grid points a single sweep may expand to
+MAX_SWEEP_POINTS = int(os.environ.get("DEAL_SWEEP_MAX_POINTS", 1_000))
+
+
+def _counts(codes, valid, labels):
+    return dict(zip(labels, np.bincount(codes[valid], minlength=len(labels)).tolist()))
+
+
+def grid_size(grid):
+    size = 1
+    for name, values in grid.items():
+        if name == "industry_multiples":
+            for industry_values in values.values():
+                size *= len(industry_values)
+        else:
+            size *= len(values)
+    return size
+
+
+class SweepInputs:
+    # Per-deal values every grid point is compared against, computed once from the baseline evaluation
+
+    def __init__(self, columns, batch, snapshot):
+        self.snapshot = snapshot
+        self.valid = np.ones(len(columns), dtype=bool)
+        self.valid[list(batch.errors)] = False
+        self.securities = encode_securities(columns.security_type)
+        self.discount_rate = columns.discount_rate
+        self.interest = columns.interest
+        self.industry = columns.industry
+        self.implied_multiple = batch.implied_multiple
+        self.months_of_cash = batch.months_of_cash
+        self._industry_codes = None
+        self.baseline = {
+            "discount_rate_assessment": batch.discount_codes,
+            "interest_rate_assessment": batch.interest_codes,
+            "valuation_assessment": batch.valuation_codes,
+            "runway_assessment": batch.runway_codes,
+        }
+
+    def assess(self, assessment, parameters):
+        # Codes for one assessment under the current config with parameters layered over it
+        config = {**self.snapshot.config, **parameters}
+        if assessment == "discount_rate_assessment":
+            return assess_discount(self.securities, self.discount_rate, config)
+        if assessment == "interest_rate_assessment":
+            return assess_interest(self.securities, self.interest, config)
+        if assessment == "runway_assessment":
+            return assess_runway(self.months_of_cash, config)
+        return self.assess_valuation(config)
+
+    def assess_valuation(self, config):
+        scale = config.get("industry_multiple_scale", 1.0)
+        multiples = {
+            name: None if value is None else value * scale for name, value in self.snapshot.industry_multiples.items()
+        }
+        multiples.update(config.get("industry_multiples", {}))
+        tables = build_tables(config, multiples)
+        # Every setting adds the same industries in the same order, so the codes only need encoding once
+        if self._industry_codes is None:
+            self._industry_codes = tables.encode_industries(self.industry)
+        return assess_valuation(self.implied_multiple, self._industry_codes, tables)
+
+
+def _axes(assessment, grid):
+    # (name, values) pairs of the grid that move this assessment; each industry multiple is its own axis
+    axes = [(key, grid[key]) for key in DEPENDENCIES[assessment] if key in grid]
+    if assessment == "valuation_assessment":
+        if "industry_multiple_scale" in grid:
+            axes.append(("industry_multiple_scale", grid["industry_multiple_scale"]))
+        for industry, values in grid.get("industry_multiples", {}).items():
+            axes.append((("industry_multiples", industry), values))
+    return axes
+
+
+def _parameters(axes, values):
+    parameters = {}
+    for name, value in zip(axes, values):
+        if isinstance(name, tuple):
+            parameters.setdefault(name[0], {})[name[1]] = value
+        else:
+            parameters[name] = value
+    return parameters
+
+
+def _outcomes(inputs, assessment, grid, positions, include_flips):
+    # Every setting of the axes that move this assessment, evaluated once; grid points combine these outcomes
+    baseline = inputs.baseline[assessment]
+    labels = ASSESSMENT_LABELS[assessment]
+    axes = _axes(assessment, grid)
+    names = [name for name, _ in axes]
+    outcomes = []
+    for values in product(*(values for _, values in axes)):
+        parameters = _parameters(names, values)
+        codes = inputs.assess(assessment, parameters) if axes else baseline
+        flipped = np.flatnonzero((codes != baseline) & inputs.valid)
+        outcome = {
+            "parameters": parameters,
+            "counts": _counts(codes, inputs.valid, labels),
+            "flipped": len(flipped),
+        }
+        if include_flips:
+            outcome["flips"] = [
+                {"index": positions[i], "from": labels[baseline[i]], "to": labels[codes[i]]} for i in flipped.tolist()
+            ]
+        outcomes.append(outcome)
+    return outcomes
+
+
+def sweep(columns, batch, snapshot, grid, positions=None, include_flips=True):
+    # grid maps config keys, industry_multiple_scale and industry_multiples ({industry: values}) to lists of values.
+    # Each assessment depends on its own keys only, so every assessment is evaluated once per setting of its own
+    # axes and the cartesian grid is assembled from those outcomes instead of re-running the whole evaluation.
+    # Per-deal flips are listed once per outcome; each grid point names the outcome it uses for every assessment.
+    positions = range(len(columns)) if positions is None else positions
+    inputs = SweepInputs(columns, batch, snapshot)
+    outcomes = {
+        assessment: _outcomes(inputs, assessment, grid, positions, include_flips) for assessment in ASSESSMENT_LABELS
+    }
+
+    points = []
+    for combination in product(*(enumerate(results) for results in outcomes.values())):
+        parameters = {}
+        for _, outcome in combination:
+            parameters.update(outcome["parameters"])
+        points.append(
+            {
+                "parameters": parameters,
+                "outcomes": {assessment: i for assessment, (i, _) in zip(outcomes, combination)},
+                "counts": {assessment: outcome["counts"] for assessment, (_, outcome) in zip(outcomes, combination)},
+                "flipped": {assessment: outcome["flipped"] for assessment, (_, outcome) in zip(outcomes, combination)},
+            }
+        )
+    baseline = {
+        assessment: _counts(inputs.baseline[assessment], inputs.valid, labels)
+        for assessment, labels in ASSESSMENT_LABELS.items()
+    }
+    return {"baseline": {"version": snapshot.version, "counts": baseline}, "outcomes": outcomes, "points": points}
@@ -0,0 +1,58 @@
+import csv
+import io
+import random
+
+from constants import INDUSTRY_MULTIPLES, SECURITIES
+
+CSV_FIELDS = (
+    "company_name", "industry", "ask", "valuation_cap", "security_type", "discount_rate", "interest",
+    "yearly_revenue", "monthly_burn", "current_cash", "months_of_cash", "previous_raise",
+)
+
+
+def generate_deal(rng, index=0):
+    # Revenue is kept positive so every synthetic deal evaluates without errors
+    years = rng.randint(1, 5)
+    revenue = [round(rng.uniform(10_000, 1_000_000), 2)]
+    for _ in range(years - 1):
+        revenue.append(round(revenue[-1] * rng.uniform(0.8, 8.0), 2))
+    monthly_burn = rng.choice([0.0, round(rng.uniform(1_000, 200_000), 2)])
+    return {
+        "company_name": f"Company {index}",
+        "industry": rng.choice(list(INDUSTRY_MULTIPLES)),
+        "ask": round(rng.uniform(50_000, 5_000_000), 2),
+        "valuation_cap": round(rng.uniform(500_000, 50_000_000), 2),
+        "security_type": rng.choice(SECURITIES),
+        "discount_rate": rng.choice([0.0, 0.1, 0.15, 0.2, 0.25]),
+        "interest": rng.choice([0.0, 0.02, 0.06, 0.08]),
+        "yearly_revenue": revenue,
+        "monthly_burn": monthly_burn,
+        "current_cash": round(rng.uniform(0, 5_000_000), 2),
+        "months_of_cash": 0.0,
+        "previous_raise": round(rng.uniform(0, 2_000_000), 2),
+    }
+
+
+def generate_deals(count, seed=0):
+    rng = random.Random(seed)
+    return [generate_deal(rng, index) for index in range(count)]
+
+
+def iter_csv_lines(count, seed=0):
+    # Same format /upload-csv accepts, yielded line by line so large files need not fit in memory
+    rng = random.Random(seed)
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(CSV_FIELDS)
+    for index in range(count + 1):
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        if index < count:
+            deal = generate_deal(rng, index)
+            deal["yearly_revenue"] = ",".join(map(str, deal["yearly_revenue"]))
+            writer.writerow([deal[name] for name in CSV_FIELDS])
+
+
+def generate_csv(count, seed=0):
+    return "".join(iter_csv_lines(count, seed)).encode("utf-8")
@@ -0,0 +1,38 @@
+import os
+import shutil
+import sys
+import tempfile
+
+import pytest
+
+# The backend modules import each other by bare name, as they do when run from project/backend
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+# The deal store, jobs database and job uploads are read from the environment at import time, so they are
+# pointed at a scratch directory before any test imports the backend; the config stays in this process
+STATE_DIR = tempfile.mkdtemp(prefix="deal-tests-")
+os.environ.update(
+    DEAL_STORE_DB=os.path.join(STATE_DIR, "deals.sqlite3"),
+    DEAL_JOBS_DB=os.path.join(STATE_DIR, "jobs.sqlite3"),
+    DEAL_JOBS_DIR=os.path.join(STATE_DIR, "job_uploads"),
+)
+os.environ.pop("DEAL_CONFIG_DB", None)
+
+
+def pytest_unconfigure(config):
+    shutil.rmtree(STATE_DIR, ignore_errors=True)
+
+
+@pytest.fixture(autouse=True)
+def restore_config():
+    # Tests may publish new versions; each one starts from the same snapshot and an empty evaluation cache
+    import config_store
+    from cache import evaluation_cache
+
+    snapshot = config_store.current_snapshot()
+    evaluation_cache.clear()
+    yield
+    config_store._current = snapshot
+    evaluation_cache.clear()
@@ -0,0 +1,88 @@
+import asyncio
+import random
+from collections import Counter
+
+import numpy as np
+import pytest
+
+from aggregates import SUMMARY_ACCURACY, PortfolioAggregate
+from batch import ASSESSMENT_LABELS, DealColumns, evaluate_batch
+from config_store import current_snapshot
+from parallel import shutdown_pool, summarize_parallel
+from test_batch_parity import random_deal
+
+ROWS = 5_000
+
+
+@pytest.fixture(scope="module")
+def deals():
+    snapshot = current_snapshot()
+    rng = random.Random(7)
+    records = [random_deal(rng, i, snapshot.config) for i in range(ROWS)]
+    columns = DealColumns.from_records(records)
+    return columns, evaluate_batch(columns, dict(snapshot.config), dict(snapshot.industry_multiples))
+
+
+def assert_close(actual, expected, path="summary"):
+    # Counts and sketches merge exactly; only float sums may differ in the last bits with the order of addition
+    if isinstance(expected, dict):
+        assert actual.keys() == expected.keys(), path
+        for key in expected:
+            assert_close(actual[key], expected[key], f"{path}.{key}")
+    elif isinstance(expected, float):
+        assert actual == pytest.approx(expected, rel=1e-9), path
+    else:
+        assert actual == expected, path
+
+
+def single_pass(columns, batch):
+    aggregate = PortfolioAggregate()
+    aggregate.add(columns, batch)
+    return aggregate
+
+
+@pytest.mark.parametrize("chunk_size", [1, 333, 2_048])
+def test_merged_chunks_match_single_pass(deals, chunk_size):
+    columns, _ = deals
+    snapshot = current_snapshot()
+    config, multiples = dict(snapshot.config), dict(snapshot.industry_multiples)
+    merged = PortfolioAggregate()
+    for start in range(0, len(columns), chunk_size):
+        chunk = columns.slice(start, start + chunk_size)
+        merged.merge(single_pass(chunk, evaluate_batch(chunk, config, multiples)))
+    assert_close(merged.summary(snapshot), single_pass(*deals).summary(snapshot))
+
+
+def test_parallel_summary_matches_single_pass(deals):
+    snapshot = current_snapshot()
+    try:
+        aggregate = asyncio.run(summarize_parallel(deals[0], workers=2, chunk_size=700))
+    finally:
+        shutdown_pool()
+    assert_close(aggregate.summary(snapshot), single_pass(*deals).summary(snapshot))
+
+
+def test_summary_matches_per_row_results(deals):
+    columns, batch = deals
+    summary = single_pass(columns, batch).summary(current_snapshot())
+    rows = [(i, batch.metrics(i)) for i in range(len(columns)) if i not in batch.errors]
+    assert summary["rows"] == ROWS
+    assert summary["errors"] == len(batch.errors)
+    assert summary["evaluated"] == len(rows)
+
+    for name, labels in ASSESSMENT_LABELS.items():
+        counts = Counter(metrics[name] for _, metrics in rows)
+        assert summary["assessments"][name] == {label: counts[label] for label in labels}
+        for industry, entry in summary["industries"].items():
+            counts = Counter(metrics[name] for i, metrics in rows if columns.industry[i] == industry)
+            assert entry["assessments"][name] == {label: counts[label] for label in labels}
+
+    implied = [metrics["implied_multiples"] for _, metrics in rows]
+    implied = np.array([value for value in implied if value is not None])
+    implied = implied[np.isfinite(implied)]
+    assert summary["implied_multiple"]["count"] == len(implied)
+    assert summary["implied_multiple"]["mean"] == pytest.approx(implied.mean())
+    # The sketch's median lies within the advertised relative error of a value at the median rank
+    low, high = np.sort(implied)[[(len(implied) - 1) // 2, len(implied) // 2]]
+    median = summary["implied_multiple"]["median"]
+    assert low * (1 - SUMMARY_ACCURACY) <= median <= high * (1 + SUMMARY_ACCURACY)
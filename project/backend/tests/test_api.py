@@ -0,0 +1,78 @@
+import asyncio
+import random
+
+import pytest
+from fastapi.testclient import TestClient
+
+from batch import DealColumns
+from config_store import current_snapshot
+from main import app
+from parallel import shutdown_pool
+from scenarios import simulate_parallel
+from test_batch_parity import random_deal
+
+DEAL = {
+    "company_name": "Runway Co",
+    "industry": "Software",
+    "ask": 500_000,
+    "valuation_cap": 5_000_000,
+    "security_type": "SAFE",
+    "discount_rate": 0.2,
+    "interest": 0.0,
+    "yearly_revenue": [100_000, 150_000],
+    "monthly_burn": 10_000,
+    "current_cash": 100_000,
+}
+
+
+@pytest.fixture(scope="module")
+def client():
+    return TestClient(app)
+
+
+def test_bulk_items_with_config_overrides_are_refused(client):
+    overridden = dict(DEAL, config={"modeled_cash_months": 6})
+    assert client.post("/evaluate-deal", json=overridden).json()["runway_assessment"] == "Adequate"
+    assert client.post("/evaluate-deal", json=DEAL).json()["runway_assessment"] == "Inadequate"
+
+    response = client.post("/evaluate-deals", json=[DEAL, overridden])
+    assert response.status_code == 422
+    assert "[1]" in response.json()["detail"]
+    assert client.post("/evaluate-deals", json=[DEAL, dict(DEAL, config=None)]).status_code == 200
+
+
+def test_simulation_seeds(client):
+    deals = [dict(DEAL, company_name=f"Deal {i}", ask=100_000 * (i + 1)) for i in range(5)]
+    assert client.post("/simulate-deals?seed=-1", json=deals).status_code == 422
+
+    first, again, other = (
+        client.post(f"/simulate-deals?seed={seed}&paths=500", json=deals).json() for seed in (7, 7, 8)
+    )
+    assert first["seed"] == 7 and first["paths"] == 500
+    assert first["results"] == again["results"]
+    assert first["results"] != other["results"]
+
+
+def test_simulation_does_not_depend_on_chunking():
+    # Each row draws from its own child of the seed, so how rows are split over workers does not matter
+    rng = random.Random(3)
+    config = current_snapshot().config
+    columns = DealColumns.from_records([random_deal(rng, i, config) for i in range(40)])
+    try:
+        chunked = asyncio.run(simulate_parallel(columns, 11, paths=200, workers=2, chunk_size=7))
+    finally:
+        shutdown_pool()
+    assert chunked == asyncio.run(simulate_parallel(columns, 11, paths=200, workers=1))
+
+
+def test_sweep_reports_flips_by_request_index(client, monkeypatch):
+    deals = [{"company_name": "Broken"}, DEAL]
+    response = client.post("/sweep", json={"deals": deals, "grid": {"modeled_cash_months": [6.0]}})
+    assert response.status_code == 200
+    body = response.json()
+    assert [error["index"] for error in body["errors"]] == [0]
+    assert body["outcomes"]["runway_assessment"][0]["flips"] == [{"index": 1, "from": "Inadequate", "to": "Adequate"}]
+
+    monkeypatch.setattr("main.MAX_SWEEP_POINTS", 4)
+    grid = {"modeled_cash_months": [6.0, 12.0, 18.0], "modeled_discount_rate": [0.1, 0.2]}
+    assert client.post("/sweep", json={"deals": [DEAL], "grid": grid}).status_code == 413
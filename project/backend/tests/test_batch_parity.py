@@ -0,0 +1,102 @@
+import random
+
+import pytest
+
+from batch import (
+    DISCOUNT_LABELS,
+    GROWTH_CODES,
+    INTEREST_LABELS,
+    RUNWAY_LABELS,
+    VALUATION_LABELS,
+    DealColumns,
+    evaluate_batch,
+)
+from constants import DEFAULT_CONFIG, INDUSTRY_MULTIPLES, SECURITIES
+from engine import Deal
+from lookup import build_tables
+
+# "Other" is listed without a multiple; the last two industries are not listed at all
+INDUSTRIES = list(INDUSTRY_MULTIPLES) + ["Quantum Widgets", ""]
+SECURITY_TYPES = SECURITIES + ["Revenue Share", ""]
+# Revenue histories the scalar path either raises on or treats specially
+EDGE_REVENUES = ([], [0.0], [0.0, 120.0], [50.0, 0.0, 80.0], [100.0, 100.0])
+
+CONFIGS = {
+    "default": (DEFAULT_CONFIG, INDUSTRY_MULTIPLES),
+    "tweaked": (
+        {
+            **DEFAULT_CONFIG,
+            "modeled_discount_rate": 0.15,
+            "modeled_interest_rate": 0.08,
+            "modeled_revenue_growth_aggressive": 2.0,
+            "modeled_valuation_threshold": 0.4,
+            "modeled_cash_months": 18.0,
+        },
+        {**INDUSTRY_MULTIPLES, "Software": 6.5, "Energy": None, "Quantum Widgets": 1.5},
+    ),
+}
+
+
+def random_deal(rng, index, config):
+    if rng.random() < 0.3:
+        revenue = list(rng.choice(EDGE_REVENUES))
+    else:
+        revenue = [round(rng.uniform(1_000, 1_000_000), 2) for _ in range(rng.randint(1, 5))]
+    # Caps around the revenue multiple land deals in every valuation class
+    first = revenue[0] if revenue and revenue[0] else 100_000.0
+    return {
+        "company_name": f"Deal {index}",
+        "industry": rng.choice(INDUSTRIES),
+        "ask": round(rng.uniform(10_000, 2_000_000), 2),
+        "valuation_cap": rng.choice([0.0, round(first * rng.uniform(0.5, 8.0), 2)]),
+        "security_type": rng.choice(SECURITY_TYPES),
+        "discount_rate": rng.choice([0.0, config["modeled_discount_rate"], round(rng.uniform(0.01, 0.4), 3)]),
+        "interest": rng.choice([0.0, config["modeled_interest_rate"], round(rng.uniform(0.01, 0.15), 3)]),
+        "yearly_revenue": revenue,
+        "monthly_burn": rng.choice([0.0, -round(rng.uniform(1, 50_000), 2), round(rng.uniform(1, 200_000), 2)]),
+        "current_cash": rng.choice([0.0, round(rng.uniform(-50_000, 3_000_000), 2)]),
+    }
+
+
+@pytest.mark.parametrize("config_name", sorted(CONFIGS))
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_batch_matches_scalar_deal(seed, config_name):
+    config, multiples = CONFIGS[config_name]
+    tables = build_tables(config, multiples)
+    rng = random.Random(seed)
+    records = [random_deal(rng, i, config) for i in range(2_000)]
+    batch = evaluate_batch(DealColumns.from_records(records), config, multiples)
+    offsets = batch.growth_offsets.tolist()
+
+    for i, record in enumerate(records):
+        deal = Deal(**record, config=config, tables=tables)
+        try:
+            expected = deal.calculate_metrics()
+        except (ZeroDivisionError, IndexError) as exc:
+            # Rows the scalar path raises on are reported with the same message instead of failing the batch
+            assert batch.errors.get(i) == str(exc), record
+            continue
+        assert i not in batch.errors, record
+        assert batch.metrics(i) == expected, record
+        growth_codes = bytes(GROWTH_CODES[label] for label in deal.growth_rate_assessment)
+        assert batch.growth_codes[offsets[i]:offsets[i + 1]].tobytes() == growth_codes, record
+
+
+def test_every_case_is_covered():
+    # Guards the generator above: every industry kind, security type and edge revenue shows up
+    rng = random.Random(0)
+    records = [random_deal(rng, i, DEFAULT_CONFIG) for i in range(2_000)]
+    assert {record["industry"] for record in records} == set(INDUSTRIES)
+    assert {record["security_type"] for record in records} == set(SECURITY_TYPES)
+    assert {tuple(record["yearly_revenue"]) for record in records} >= {tuple(revenue) for revenue in EDGE_REVENUES}
+    burns = [record["monthly_burn"] for record in records]
+    assert min(burns) < 0 and 0.0 in burns and max(burns) > 0
+
+    batch = evaluate_batch(DealColumns.from_records(records), DEFAULT_CONFIG, INDUSTRY_MULTIPLES)
+    for codes, labels in (
+        (batch.discount_codes, DISCOUNT_LABELS),
+        (batch.interest_codes, INTEREST_LABELS),
+        (batch.valuation_codes, VALUATION_LABELS),
+        (batch.runway_codes, RUNWAY_LABELS),
+    ):
+        assert set(codes.tolist()) == set(range(len(labels)))
@@ -0,0 +1,79 @@
+import asyncio
+import random
+
+from batch import DealColumns, evaluate_batch
+from cache import CACHE_MAX_BATCH, column_keys, evaluate_cached, evaluation_cache, record_key
+from config_store import current_snapshot, publish
+from test_batch_parity import random_deal
+
+
+def deal_records(count, seed=0):
+    # Deals that all evaluate; rows that fail are not cached and would be evaluated again
+    rng = random.Random(seed)
+    config = current_snapshot().config
+    records = []
+    while len(records) < count:
+        record = random_deal(rng, len(records), config)
+        if not evaluate_batch(DealColumns.from_records([record])).errors:
+            records.append(record)
+    return records
+
+
+class CountingEvaluate:
+    # Stands in for evaluate_parallel and records how many rows each call was asked to evaluate
+
+    def __init__(self):
+        self.calls = []
+
+    async def __call__(self, columns, config, multiples):
+        self.calls.append(len(columns))
+        return evaluate_batch(columns, config, multiples)
+
+
+def assert_same(actual, expected):
+    assert len(actual) == len(expected)
+    assert actual.errors == expected.errors
+    for i in range(len(expected)):
+        if i not in expected.errors:
+            assert actual.metrics(i) == expected.metrics(i)
+
+
+def test_warm_batch_skips_evaluate():
+    records = deal_records(500)
+    columns = DealColumns.from_records(records)
+    evaluate = CountingEvaluate()
+    cold = asyncio.run(evaluate_cached(columns, evaluate))
+    warm = asyncio.run(evaluate_cached(columns, evaluate))
+    assert evaluate.calls == [500]
+    assert_same(warm, cold)
+
+    # Only the rows not seen before are evaluated; the rest come from the cache in their original positions
+    mixed_records = records[:200] + deal_records(50, seed=1) + records[200:]
+    mixed = asyncio.run(evaluate_cached(DealColumns.from_records(mixed_records), evaluate))
+    assert evaluate.calls == [500, 50]
+    assert_same(mixed, evaluate_batch(DealColumns.from_records(mixed_records)))
+
+
+def test_config_update_invalidates_cached_rows():
+    records = deal_records(200)
+    columns = DealColumns.from_records(records)
+    evaluate = CountingEvaluate()
+    asyncio.run(evaluate_cached(columns, evaluate))
+    snapshot = publish(config={"modeled_discount_rate": 0.15, "modeled_cash_months": 18.0})
+    updated = asyncio.run(evaluate_cached(columns, evaluate))
+    assert evaluate.calls == [200, 200]
+    assert_same(updated, evaluate_batch(columns, snapshot.config, snapshot.industry_multiples))
+
+    # /evaluate-deal keys a record the same way the bulk paths key its row, and the version is part of the key
+    version = snapshot.version
+    assert column_keys(columns, version) == [record_key(record, version) for record in records]
+    assert record_key(records[0], version) != record_key(records[0], version - 1)
+
+
+def test_large_batches_bypass_the_cache():
+    columns = DealColumns.from_records(deal_records(CACHE_MAX_BATCH + 1))
+    evaluate = CountingEvaluate()
+    asyncio.run(evaluate_cached(columns, evaluate))
+    asyncio.run(evaluate_cached(columns, evaluate))
+    assert evaluate.calls == [len(columns)] * 2
+    assert len(evaluation_cache) == 0
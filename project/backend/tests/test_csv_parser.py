@@ -0,0 +1,68 @@
+import pytest
+
+from csv_parser import CSVFormatError, parse_deal_csv
+from streaming import CSVBatcher
+
+HEADER = "company_name,industry,ask,valuation_cap,security_type,discount_rate,interest,yearly_revenue,monthly_burn\n"
+
+# Line 1 is the header; blank lines and the quoted newline in line 6 still count towards later line numbers
+TEXT = (
+    HEADER
+    + 'Alpha,Software,100,1000,SAFE,0.2,0,"10,20",5\n'
+    + "\n"
+    + 'Bravo,Software,lots,1000,SAFE,0.2,0,"10,20",5\n'
+    + "Charlie,Software,100\n"
+    + '"Delta\nCorp",Software,100,1000,SAFE,0.2,0,"10,20",\n'
+    + 'Echo,Software,100,1000,SAFE,0.2,0,"10,x",5\n'
+    + "\n"
+    + 'Foxtrot,Software,100,1000,SAFE,0.2,0,"10,20",oops\n'
+    + 'Golf,Software,100,1000,SAFE,0.2,0,"30",\n'
+)
+GOOD = [("Alpha", 2), ("Delta\nCorp", 7), ("Golf", 11)]
+ERRORS = [
+    (4, "Bravo", "ask: could not convert 'lots' to float"),
+    (5, "Charlie", "expected at least 9 fields, found 3"),
+    (8, "Echo", "yearly_revenue: could not parse '10,x'"),
+    (10, "Foxtrot", "monthly_burn: could not convert 'oops' to float"),
+]
+
+
+def summarize(parsed):
+    good = list(zip(parsed.columns.company_name.tolist(), parsed.line_numbers.tolist()))
+    errors = [(error["line"], error["company_name"], error["error"]) for error in parsed.errors]
+    return good, errors
+
+
+def test_rows_and_errors_keep_their_line_numbers():
+    # A record spanning several lines is numbered by the line it ends on, as csv.reader counts lines
+    parsed = parse_deal_csv(TEXT)
+    assert summarize(parsed) == (GOOD, ERRORS)
+    assert parsed.columns.revenue.tolist() == [10.0, 20.0, 10.0, 20.0, 30.0]
+    assert parsed.columns.monthly_burn.tolist() == [5.0, 0.0, 0.0]
+
+
+def test_windows_line_endings():
+    parsed = parse_deal_csv(TEXT.replace("\n", "\r\n").replace("Delta\r\nCorp", "Delta\nCorp"))
+    assert summarize(parsed) == (GOOD, ERRORS)
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 64, 10_000])
+def test_chunked_parsing_numbers_lines_across_the_whole_file(chunk_size):
+    data = TEXT.encode("utf-8")
+    batcher = CSVBatcher()
+    chunks = [batcher.feed(data[start:start + chunk_size]) for start in range(0, len(data), chunk_size)]
+    chunks.append(batcher.feed(b"", final=True))
+    good = []
+    errors = []
+    for parsed in filter(None, chunks):
+        chunk_good, chunk_errors = summarize(parsed)
+        good += chunk_good
+        errors += chunk_errors
+    assert (good, sorted(errors)) == (GOOD, ERRORS)
+
+
+def test_missing_required_column_fails_the_whole_file():
+    with pytest.raises(CSVFormatError, match="yearly_revenue"):
+        parse_deal_csv("company_name,industry,ask,valuation_cap,security_type,discount_rate,interest\n")
+    with pytest.raises(CSVFormatError, match="empty"):
+        parse_deal_csv("")
@@ -0,0 +1,83 @@
+import random
+
+import pytest
+
+import deal_store
+from batch import DealColumns, evaluate_batch
+from config_store import current_snapshot
+from deal_store import DealStore, publish_and_reassess
+
+INDUSTRIES = ["Software", "Biotechnology", "Other", "Quantum Widgets"]
+SECURITY_TYPES = ["SAFE", "Convertible Note", "Common Equity"]
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    store = DealStore(str(tmp_path / "deals.sqlite3"))
+    monkeypatch.setattr(deal_store, "_store", store)
+    return store
+
+
+def deal_columns(count, seed=0):
+    rng = random.Random(seed)
+    records = []
+    for i in range(count):
+        revenue = round(rng.uniform(10_000, 500_000), 2)
+        records.append({
+            "company_name": f"Deal {i:03d}",
+            "industry": rng.choice(INDUSTRIES),
+            "ask": 100_000.0,
+            "valuation_cap": round(revenue * rng.uniform(1, 6), 2),
+            "security_type": rng.choice(SECURITY_TYPES),
+            "discount_rate": rng.choice([0.1, 0.2, 0.3]),
+            "interest": rng.choice([0.03, 0.06, 0.09]),
+            "yearly_revenue": [revenue, revenue * 2],
+            "monthly_burn": rng.choice([0.0, 10_000.0]),
+            "current_cash": round(rng.uniform(0, 300_000), 2),
+        })
+    return DealColumns.from_records(records)
+
+
+def stored_assessments(store):
+    _, deals = store.query(limit=10_000)
+    return {deal["company_name"]: (deal["metrics"], deal["config_version"]) for deal in deals}
+
+
+def fresh_assessments(columns):
+    # What evaluating the deals again under the current snapshot gives
+    snapshot = current_snapshot()
+    batch = evaluate_batch(columns)
+    names = columns.company_name.tolist()
+    return {names[i]: (batch.metrics(i), snapshot.version) for i in range(len(columns))}
+
+
+def test_update_reassesses_only_affected_deals(store):
+    columns = deal_columns(200)
+    snapshot = current_snapshot()
+    store.record_batch(columns, evaluate_batch(columns), snapshot.version)
+    before = stored_assessments(store)
+
+    _, report = publish_and_reassess(industry_multiples={"Software": 9.0})
+    assert report["reassessed"] == ["valuation_assessment"]
+    assert report["deals_updated"] == 200 and report["behind_deals"] == 0
+    after = stored_assessments(store)
+    assert after == fresh_assessments(columns)
+    flipped = {name for name in after if after[name][0] != before[name][0]}
+    software = {name for name, industry in zip(columns.company_name, columns.industry) if industry == "Software"}
+    assert flipped and flipped <= software
+    assert report["changed"] == {"valuation_assessment": len(flipped)}
+    assert report["changed_deals"] == len(flipped)
+
+
+def test_rows_stored_after_an_update_are_brought_forward(store):
+    # Evaluated under one version, written after the next one was published; the update after that catches them
+    columns = deal_columns(100, seed=1)
+    evaluated_under = current_snapshot()
+    batch = evaluate_batch(columns)
+    publish_and_reassess(config={"modeled_cash_months": 6.0})
+    store.record_batch(columns, batch, evaluated_under.version)
+
+    snapshot, report = publish_and_reassess(config={"modeled_valuation_threshold": 0.1})
+    assert report["deals_updated"] == 100 and report["behind_deals"] == 100
+    assert stored_assessments(store) == fresh_assessments(columns)
+    assert {version for _, version in stored_assessments(store).values()} == {snapshot.version}
@@ -0,0 +1,111 @@
+import os
+import time
+
+import pytest
+
+from config_store import current_snapshot
+from instrumentation import JOB_ROWS_TOTAL
+from jobs import COMPLETED, JOB_RETENTION, RUNNING, JobRunner, JobStore
+
+HEADER = "company_name,industry,ask,valuation_cap,security_type,discount_rate,interest,yearly_revenue,monthly_burn\n"
+
+
+def upload_text(rows):
+    # Every tenth deal fails to parse and every tenth fails to evaluate
+    lines = []
+    for i in range(rows):
+        if i % 10 == 3:
+            lines.append(f'Bad {i},Software,lots,1000,SAFE,0.2,0,"10,20",5\n')
+        elif i % 10 == 7:
+            lines.append(f'Zero {i},Software,100,1000,SAFE,0.2,0,"0,20",5\n')
+        else:
+            lines.append(f'Deal {i},Biotechnology,100,{1000 + i},Convertible Note,0.2,0.06,"{10 + i},{40 + i}",{i}\n')
+    return HEADER + "".join(lines)
+
+
+@pytest.fixture
+def runner(tmp_path):
+    runner = JobRunner(JobStore(str(tmp_path / "jobs.sqlite3")), workers=1, uploads_dir=str(tmp_path / "uploads"))
+    yield runner
+    runner.shutdown()
+
+
+def run_job(runner, job_id, text, chunk_size, next_chunk=0):
+    # Runs the job on this thread; next_chunk stands in for chunks committed before a restart
+    path = runner.upload_path(job_id)
+    with open(path, "w") as upload:
+        upload.write(text)
+    runner.store.create(job_id, path, chunk_size, current_snapshot())
+    if next_chunk:
+        runner.store.update(job_id, next_chunk=next_chunk)
+    runner.run(job_id)
+    return runner.store.get(job_id), runner.store.results(job_id, 0, 1_000)
+
+
+def test_chunked_job_matches_a_single_chunk(runner):
+    text = upload_text(45)
+    counted = JOB_ROWS_TOTAL._values.get((), 0)
+    job, results = run_job(runner, "chunked", text, chunk_size=4)
+    assert JOB_ROWS_TOTAL._values[()] - counted == 45
+    _, whole = run_job(runner, "whole", text, chunk_size=1_000)
+
+    assert job["status"] == COMPLETED and job["error"] is None
+    assert (job["total_rows"], job["processed_rows"], job["error_rows"], job["next_chunk"]) == (45, 45, 9, 12)
+    assert results == whole
+    errors = [(result["line"], result["error"]) for result in results if "error" in result]
+    assert errors[:2] == [(5, "ask: could not convert 'lots' to float"), (9, "float division by zero")]
+    assert results[0] == {
+        "company_name": "Deal 0",
+        "metrics": {
+            "growth_rates": [300.0],
+            "implied_multiples": 100.0,
+            "discount_rate_assessment": "Standard Discount",
+            "interest_rate_assessment": "Standard Interest",
+            "valuation_assessment": "High Valuation",
+            "runway_assessment": "Unknown",
+        },
+    }
+    # A finished job no longer needs its upload
+    assert not os.path.exists(runner.upload_path("chunked"))
+
+
+def test_resume_skips_committed_chunks(runner):
+    job, results = run_job(runner, "resumed", upload_text(45), chunk_size=4, next_chunk=10)
+    assert job["status"] == COMPLETED
+    assert [result.get("company_name") for result in results] == ["Deal 40", "Deal 41", "Deal 42", "Bad 43", "Deal 44"]
+
+
+def test_shutdown_leaves_the_job_to_resume(runner):
+    text = upload_text(45)
+    commit_chunk = runner.store.commit_chunk
+
+    def commit_then_shut_down(job_id, chunk, rows):
+        commit_chunk(job_id, chunk, rows)
+        if chunk == 2:
+            runner.shutdown()
+
+    runner.store.commit_chunk = commit_then_shut_down
+    job, _ = run_job(runner, "stopped", text, chunk_size=4)
+    assert (job["status"], job["next_chunk"]) == (RUNNING, 3)
+    assert os.path.exists(runner.upload_path("stopped"))
+
+    # The next process carries on from the checkpoint and ends with what one uninterrupted run gives
+    resumed = JobRunner(runner.store, workers=1, uploads_dir=runner.uploads_dir)
+    try:
+        resumed.run("stopped")
+        _, whole = run_job(resumed, "whole", text, chunk_size=1_000)
+    finally:
+        resumed.shutdown()
+    assert runner.store.get("stopped")["status"] == COMPLETED
+    assert runner.store.results("stopped", 0, 1_000) == whole
+
+
+def test_finished_jobs_expire(runner):
+    run_job(runner, "old", upload_text(5), chunk_size=4)
+    run_job(runner, "new", upload_text(5), chunk_size=4)
+    with runner.store._connect() as connection:
+        connection.execute("UPDATE jobs SET updated = ? WHERE id = 'old'", (time.time() - JOB_RETENTION - 1,))
+
+    runner.prune()
+    assert runner.store.get("old") is None and runner.store.results("old", 0, 10) == []
+    assert runner.store.get("new") is not None and len(runner.store.results("new", 0, 10)) == 5
@@ -0,0 +1,95 @@
+import json
+import random
+
+import pytest
+from starlette.responses import JSONResponse
+
+import serialization
+from batch import DealColumns, evaluate_batch
+from engine import Deal, evaluate_record
+from serialization import encode_metrics, encode_named, encode_results, encode_row, string_tokens
+
+# Names the split-based encoders must not trip over
+COMPANY_NAMES = [
+    'Plain', 'Quote "Co"', 'Comma, Inc', 'Back\\slash', '","', 'a",', 'Ünïcødé 株式会社', 'Tab\tNew\nline', '',
+]
+INDUSTRIES = ["Software", "Biotechnology", "Other", "Quantum Widgets"]
+SECURITY_TYPES = ["SAFE", "Convertible Note", "Common Equity", "Warrant"]
+REVENUES = ([0.0], [0.0, 5.0], [1.0, 3.0, 2.0], [123456.789, 1e-7, 2.5e9], [100.0, 100.0])
+
+
+def random_deals(count, seed=0):
+    rng = random.Random(seed)
+    return [
+        {
+            "company_name": rng.choice(COMPANY_NAMES) + f" {i}",
+            "industry": rng.choice(INDUSTRIES),
+            "ask": 1.0,
+            "valuation_cap": rng.choice([0.0, 1e16, rng.uniform(1, 1e7)]),
+            "security_type": rng.choice(SECURITY_TYPES),
+            "discount_rate": rng.choice([0.0, 0.2, rng.random()]),
+            "interest": rng.choice([0.0, 0.06, rng.random()]),
+            "yearly_revenue": list(rng.choice(REVENUES)) if rng.random() < 0.5 else [rng.uniform(1, 1e6)] * 3,
+            "monthly_burn": rng.choice([0.0, -5.0, rng.uniform(1, 1e5)]),
+            "current_cash": rng.uniform(0, 1e6),
+        }
+        for i in range(count)
+    ]
+
+
+@pytest.fixture(params=["orjson", "stdlib"])
+def reference(request, monkeypatch):
+    # The bytes the dict-based responses produced: Starlette's JSONResponse without orjson, orjson.dumps with it
+    if request.param == "stdlib":
+        monkeypatch.setattr(serialization, "orjson", None)
+        return lambda content: JSONResponse(content).body
+    orjson = pytest.importorskip("orjson")
+    return orjson.dumps
+
+
+def scalar_metrics(record):
+    try:
+        return Deal(**record).calculate_metrics()
+    except (ZeroDivisionError, IndexError):
+        return None
+
+
+def test_rows_encode_like_calculate_metrics(reference):
+    deals = random_deals(500)
+    batch = evaluate_batch(DealColumns.from_records(deals))
+    for record, encoded in zip(deals, encode_metrics(batch)):
+        expected = scalar_metrics(record)
+        assert encoded == (None if expected is None else reference(expected))
+        if expected is not None:
+            assert encode_row(evaluate_record(record)) == encoded
+
+
+def test_results_encode_like_the_upload_response(reference):
+    deals = random_deals(500, seed=1)
+    batch = evaluate_batch(DealColumns.from_records(deals))
+    names = [deal["company_name"] for deal in deals]
+    errors = [{"line": i + 2, "company_name": names[i], "error": message} for i, message in batch.errors.items()]
+    summary = {"rows": len(deals), "median": None, "label": 'a "b"'}
+
+    results = [result for result in encode_named(names, encode_metrics(batch)) if result is not None]
+    expected = [
+        {"company_name": deal["company_name"], "metrics": scalar_metrics(deal)}
+        for deal in deals
+        if scalar_metrics(deal) is not None
+    ]
+    assert encode_results(results, errors) == reference({"results": expected, "errors": errors})
+    assert encode_results(results, errors, summary) == reference(
+        {"results": expected, "errors": errors, "summary": summary}
+    )
+
+
+def test_names_encode_on_their_own(reference):
+    # Whole names, not suffixed, so that one ending in '",' is followed directly by the next
+    names = COMPANY_NAMES * 2
+    assert string_tokens(names) == [reference(name)[1:-1] for name in names]
+    deals = [dict(deal, company_name=name) for deal, name in zip(random_deals(len(names), seed=2), names)]
+    batch = evaluate_batch(DealColumns.from_records(deals))
+    body = encode_results([result for result in encode_named(names, encode_metrics(batch)) if result is not None], [])
+    assert [result["company_name"] for result in json.loads(body)["results"]] == [
+        name for i, name in enumerate(names) if i not in batch.errors
+    ]
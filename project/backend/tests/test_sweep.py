@@ -0,0 +1,55 @@
+import random
+
+import numpy as np
+import pytest
+
+from batch import ASSESSMENTS, DealColumns, evaluate_batch
+from config_store import current_snapshot
+from sweep import grid_size, sweep
+from test_batch_parity import random_deal
+
+GRID = {
+    "modeled_discount_rate": [0.1, 0.2, 0.3],
+    "modeled_cash_months": [6.0, 18.0],
+    "industry_multiple_scale": [0.5, 1.0],
+    "industry_multiples": {"Software": [2.0, 9.0], "Quantum Widgets": [1.5]},
+}
+
+
+def point_inputs(snapshot, parameters):
+    # The config and multiples a full evaluation at this grid point would run with
+    parameters = dict(parameters)
+    scale = parameters.pop("industry_multiple_scale", 1.0)
+    overrides = parameters.pop("industry_multiples", {})
+    multiples = {name: None if value is None else value * scale for name, value in snapshot.industry_multiples.items()}
+    multiples.update(overrides)
+    return {**snapshot.config, **parameters}, multiples
+
+
+@pytest.mark.parametrize("seed", [0, 1])
+def test_grid_points_match_full_evaluations(seed):
+    snapshot = current_snapshot()
+    rng = random.Random(seed)
+    columns = DealColumns.from_records([random_deal(rng, i, snapshot.config) for i in range(1_000)])
+    batch = evaluate_batch(columns, snapshot.config, snapshot.industry_multiples)
+    valid = np.ones(len(columns), dtype=bool)
+    valid[list(batch.errors)] = False
+    result = sweep(columns, batch, snapshot, GRID)
+
+    assert len(result["points"]) == grid_size(GRID) == 24
+    for name in ("discount_rate_assessment", "valuation_assessment", "runway_assessment"):
+        assert any(point["flipped"][name] for point in result["points"]), name
+    for point in result["points"]:
+        expected = evaluate_batch(columns, *point_inputs(snapshot, point["parameters"]))
+        for name, codes, labels in ASSESSMENTS:
+            baseline = getattr(batch, codes)
+            swept = getattr(expected, codes)
+            counts = np.bincount(swept[valid], minlength=len(labels)).tolist()
+            assert point["counts"][name] == dict(zip(labels, counts)), (name, point["parameters"])
+
+            # Flips are listed on the outcome the point uses, against the baseline evaluation
+            outcome = result["outcomes"][name][point["outcomes"][name]]
+            flipped = np.flatnonzero((swept != baseline) & valid).tolist()
+            assert point["flipped"][name] == len(flipped)
+            assert [flip["index"] for flip in outcome["flips"]] == flipped
+            assert all(flip["to"] == labels[swept[flip["index"]]] for flip in outcome["flips"])
@@ -1,13 +1,16 @@
 import axios from "axios";
 
-const API_BASE_URL = "https://laughing-engine-x9vpgpv4pppcpjrr-8000.app.github.dev";
+// REACT_APP_API_BASE_URL points every request at one backend; without it the CSV upload keeps using the local one
+const API_BASE_URL =
+  process.env.REACT_APP_API_BASE_URL || "https://laughing-engine-x9vpgpv4pppcpjrr-8000.app.github.dev";
+const UPLOAD_BASE_URL = process.env.REACT_APP_API_BASE_URL || "http://127.0.0.1:8000";
 
 // Utility function to handle axios requests
-const axiosRequest = async (method, url, data = null, headers = {}) => {
+const axiosRequest = async (method, url, data = null, headers = {}, baseUrl = API_BASE_URL) => {
   try {
     const response = await axios({
       method,
-      url: `${API_BASE_URL}${url}`,
+      url: `${baseUrl}${url}`,
       data,
       headers,
     });
@@ -39,3 +42,20 @@ export const getConfig = () => axiosRequest("get", "/get-config");
 
 export const getIndustryMultiples = () =>
   axiosRequest("get", "/get-industry-multiples");
+
+export const createUploadJob = (file) => {
+  const formData = new FormData();
+  formData.append("file", file);
+  return axiosRequest(
+    "post",
+    "/jobs/upload-csv",
+    formData,
+    { "Content-Type": "multipart/form-data" },
+    UPLOAD_BASE_URL
+  );
+};
+
+export const getJob = (jobId) => axiosRequest("get", `/jobs/${jobId}`, null, {}, UPLOAD_BASE_URL);
+
+export const getJobResults = (jobId, offset = 0, limit = 1000) =>
+  axiosRequest("get", `/jobs/${jobId}/results?offset=${offset}&limit=${limit}`, null, {}, UPLOAD_BASE_URL);
@@ -1,20 +1,45 @@
 import React, { useState } from "react";
-import axios from "axios";
+import { createUploadJob, getJob, getJobResults } from "../api";
+
+const POLL_INTERVAL_MS = 1000;
+const PAGE_SIZE = 1000;
+
+const sleep = (ms) => new Promise((resolve) => setTimeout(resolve, ms));
 
 const CSVUpload = () => {
   const [results, setResults] = useState([]);
+  const [rowErrors, setRowErrors] = useState([]);
+  const [progress, setProgress] = useState(null);
   const [error, setError] = useState(null);
 
   const handleFileUpload = async (e) => {
     const file = e.target.files[0];
-    const formData = new FormData();
-    formData.append("file", file);
+    setError(null);
+    setResults([]);
+    setRowErrors([]);
 
     try {
-      const response = await axios.post("http://127.0.0.1:8000/upload-csv", formData, {
-        headers: { "Content-Type": "multipart/form-data" },
-      });
-      setResults(response.data.results);
+      // Large files are evaluated as a background job; poll until it finishes
+      const { job_id: jobId } = await createUploadJob(file);
+      let job = await getJob(jobId);
+      while (job.status === "queued" || job.status === "running") {
+        setProgress(job.progress);
+        await sleep(POLL_INTERVAL_MS);
+        job = await getJob(jobId);
+      }
+      if (job.status === "failed") {
+        throw new Error(job.error);
+      }
+      setProgress(job.progress);
+
+      const rows = [];
+      for (let offset = 0; offset < job.processed_rows; offset += PAGE_SIZE) {
+        const page = await getJobResults(jobId, offset, PAGE_SIZE);
+        rows.push(...page.results);
+      }
+      // Rows that failed to parse or evaluate come back with an error instead of metrics
+      setResults(rows.filter((row) => !row.error));
+      setRowErrors(rows.filter((row) => row.error));
     } catch (err) {
       setError("Failed to process the CSV file.");
       console.error(err);
@@ -25,6 +50,7 @@ const CSVUpload = () => {
     <div>
       <h2>Upload CSV</h2>
       <input type="file" accept=".csv" onChange={handleFileUpload} />
+      {progress !== null && <p>Progress: {Math.round(progress * 100)}%</p>}
       {error && <p style={{ color: "red" }}>{error}</p>}
       {results.length > 0 && (
         <div>
@@ -32,6 +58,18 @@ const CSVUpload = () => {
           <pre>{JSON.stringify(results, null, 2)}</pre>
         </div>
       )}
+      {rowErrors.length > 0 && (
+        <div>
+          <h3>Rows with errors</h3>
+          <ul>
+            {rowErrors.map((row) => (
+              <li key={row.line}>
+                Line {row.line} ({row.company_name}): {row.error}
+              </li>
+            ))}
+          </ul>
+        </div>
+      )}
     </div>
   );
 };